@@ -0,0 +1,90 @@
+# coding: utf-8
+# The program converts a batch of Altium's Bills of Materials to Bills to Purchase Items
+# and Lists of Components. Every BOM is read once and both "_bpi.txt" and "_loc.txt"
+# files are written from the same rows, the BOMs are spread across the CPU cores.
+# Only BOMs with a header are converted, other text files (purchase lists, BOM diffs,
+# build lists) are reported as errors and no files are written for them.
+# In the command line enter
+# python <Current Python File> <BOM Directory or Glob> ... <BOM Directory or Glob>
+
+from concurrent.futures import ProcessPoolExecutor
+import csv
+import glob
+import os
+import sys
+import time
+
+import altium_bom_to_bpi
+import altium_bom_to_loc
+from altium_bom_reader import read_bom
+
+BOM_EXTENSION = '.txt'
+BPI_POSTFIX = '_bpi.txt'
+LOC_POSTFIX = '_loc.txt'
+
+
+def find_boms(patterns):
+
+    # a directory stands for all BOMs inside it, the converter's own outputs are skipped
+    boms = []
+    seen = set()
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            pattern = os.path.join(pattern, '*' + BOM_EXTENSION)
+        for file_name in sorted(glob.glob(pattern)):
+            if file_name.endswith((BPI_POSTFIX, LOC_POSTFIX)) or file_name in seen:
+                continue
+            seen.add(file_name)
+            boms.append(file_name)
+    return boms
+
+
+def convert_bom(input_file_name):
+
+    t = time.time()
+    try:
+        rows = list(read_bom(input_file_name, require_header=True))
+        t_read = time.time() - t
+        altium_bom_to_bpi.write_csv(rows, input_file_name[:-4] + BPI_POSTFIX)
+        altium_bom_to_loc.write_csv(rows, input_file_name[:-4] + LOC_POSTFIX)
+    except (OSError, ValueError, csv.Error) as err:
+        return input_file_name, 0, 0, time.time() - t, str(err)
+    return input_file_name, len(rows), t_read, time.time() - t, ''
+
+
+def convert_boms(boms, workers=None):
+
+    if workers is None:
+        workers = os.cpu_count() or 1
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(convert_bom, boms))
+
+
+def print_summary(results, total_time):
+
+    width = max([len(result[0]) for result in results] + [len('BOM')])
+    print('%-*s %10s %10s %10s' % (width, 'BOM', 'Lines', 'Read, s', 'Total, s'))
+    failed = 0
+    for file_name, lines, t_read, t_total, error in results:
+        if error:
+            failed += 1
+            print('%-*s ERROR: %s' % (width, file_name, error))
+        else:
+            print('%-*s %10d %10.6f %10.6f' % (width, file_name, lines, t_read, t_total))
+    print('%d BOM(s) converted, %d failed in %.6f s' % (len(results) - failed, failed, total_time))
+
+
+if __name__ == '__main__':
+
+    if len(sys.argv) < 2:
+        print("Usage: ", os.path.basename(sys.argv[0]), "<BOM Directory or Glob> ... <BOM Directory or Glob>")
+        sys.exit(1)
+
+    boms = find_boms(sys.argv[1:])
+    if not boms:
+        print('No BOM files found')
+        sys.exit(1)
+
+    t = time.time()
+    results = convert_boms(boms)
+    print_summary(results, time.time() - t)
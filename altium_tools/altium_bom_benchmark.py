@@ -0,0 +1,144 @@
+# coding: utf-8
+# Benchmark of the BOM converters on synthetic Altium's Bills of Materials.
+# Read, aggregate and write phases of the BPI and LOC converters are timed
+# separately for every BOM size, the peak memory is measured in a separate
+# run, the results are written to a JSON file.
+# In the command line enter
+# python <Current Python File> [--sizes 1000 10000 ...] [--unique-parts N] [--output result.json]
+
+import argparse
+import datetime
+import json
+import os
+import platform
+import random
+import tempfile
+import time
+import tracemalloc
+
+import altium_bom_to_bpi
+import altium_bom_to_loc
+from altium_bom_reader import read_bom
+
+DEFAULT_SIZES = (1000, 10000, 100000, 1000000)
+DEFAULT_UNIQUE_PARTS = 500
+
+# designator prefix, component type and share of the placements on a typical board
+DESIGNATOR_PREFIXES = (('R', 'Resistor', 0.40),
+                       ('C', 'Capacitor', 0.35),
+                       ('L', 'Inductor', 0.05),
+                       ('VD', 'Diode', 0.05),
+                       ('VT', 'Transistor', 0.03),
+                       ('DA', 'Analog IC', 0.04),
+                       ('DD', 'Digital IC', 0.04),
+                       ('XP', 'Connector', 0.02),
+                       ('ZQ', 'Crystal', 0.02))
+
+MANUFACTURERS = ('Yageo', 'Murata', 'TDK', 'Vishay', 'Nexperia', 'Texas Instruments',
+                 'Analog Devices', 'STMicroelectronics', 'Molex', 'Epson')
+
+
+def generate_bom(output_file_name, num_lines, unique_parts, seed=0):
+
+    # Parts are spread over the prefixes according to their share, the lines
+    # go in random prefix order like in a BOM sorted by anything but designator.
+    rnd = random.Random(seed)
+    prefixes = [prefix for prefix, _, _ in DESIGNATOR_PREFIXES]
+    weights = [share for _, _, share in DESIGNATOR_PREFIXES]
+    types = {prefix: component_type for prefix, component_type, _ in DESIGNATOR_PREFIXES}
+    parts = {}
+    for prefix, _, share in DESIGNATOR_PREFIXES:
+        parts[prefix] = [(prefix + '-%05d' % i, '%d' % rnd.randint(1, 999), rnd.choice(MANUFACTURERS))
+                         for i in range(max(1, int(unique_parts * share)))]
+    counters = dict.fromkeys(prefixes, 0)
+
+    with open(output_file_name, 'w', newline='') as output_file:
+        output_file.write('Designator\tComponent Type\tPart Number\tPart Label\tManufacturer\tQuantity\n')
+        for prefix in rnd.choices(prefixes, weights, k=num_lines):
+            counters[prefix] += 1
+            part_number, label, manufacturer = rnd.choice(parts[prefix])
+            output_file.write('%s%d\t%s\t%s\t%s\t%s\t1\n' % (prefix, counters[prefix], types[prefix],
+                                                            part_number, label, manufacturer))
+
+
+def run_converter(input_file_name, output_file_name, aggregate, write):
+
+    t = time.perf_counter()
+    rows = list(read_bom(input_file_name))
+    t_read = time.perf_counter()
+    data = aggregate(rows)
+    t_aggregate = time.perf_counter()
+    write(data, output_file_name)
+    t_write = time.perf_counter()
+    return {'read': t_read - t, 'aggregate': t_aggregate - t_read, 'write': t_write - t_aggregate}
+
+
+def peak_memory(input_file_name, output_file_name, aggregate, write):
+
+    tracemalloc.start()
+    try:
+        write(aggregate(read_bom(input_file_name)), output_file_name)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def benchmark(sizes, unique_parts, work_dir, repeat=1):
+
+    converters = (('bpi', altium_bom_to_bpi.aggregate_bom, altium_bom_to_bpi.write_parts),
+                  ('loc', altium_bom_to_loc.group_components, altium_bom_to_loc.write_components))
+    results = []
+    for num_lines in sizes:
+        bom_file_name = os.path.join(work_dir, 'bom_%d.txt' % num_lines)
+        generate_bom(bom_file_name, num_lines, unique_parts)
+        result = {'lines': num_lines, 'unique_parts': unique_parts,
+                  'bom_bytes': os.path.getsize(bom_file_name)}
+        for name, aggregate, write in converters:
+            output_file_name = bom_file_name[:-4] + '_' + name + '.txt'
+            # the best of the runs is the least disturbed one
+            runs = [run_converter(bom_file_name, output_file_name, aggregate, write) for _ in range(repeat)]
+            phases = {phase: min(run[phase] for run in runs) for phase in runs[0]}
+            phases['total'] = sum(phases.values())
+            phases['peak_memory_bytes'] = peak_memory(bom_file_name, output_file_name, aggregate, write)
+            result[name] = phases
+            print('%-4s %9d lines: read %.6f s, aggregate %.6f s, write %.6f s, peak %.1f MB'
+                  % (name, num_lines, phases['read'], phases['aggregate'], phases['write'],
+                     phases['peak_memory_bytes'] / 2**20))
+        results.append(result)
+    return results
+
+
+def get_arguments():
+
+    parser = argparse.ArgumentParser(description='Benchmark of the Altium BOM converters')
+    parser.add_argument('--sizes', type=int, nargs='+', default=list(DEFAULT_SIZES),
+                        help='numbers of BOM lines to benchmark')
+    parser.add_argument('--unique-parts', type=int, default=DEFAULT_UNIQUE_PARTS,
+                        help='number of unique parts in the synthetic BOMs')
+    parser.add_argument('--repeat', type=int, default=1,
+                        help='number of timed runs, the best one is reported')
+    parser.add_argument('--work-dir', default=None,
+                        help='directory for the synthetic BOMs, a temporary one by default')
+    parser.add_argument('--output', default='bom_benchmark.json',
+                        help='JSON file with the results')
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+
+    options = get_arguments()
+
+    if options.work_dir is None:
+        with tempfile.TemporaryDirectory() as work_dir:
+            results = benchmark(options.sizes, options.unique_parts, work_dir, options.repeat)
+    else:
+        os.makedirs(options.work_dir, exist_ok=True)
+        results = benchmark(options.sizes, options.unique_parts, options.work_dir, options.repeat)
+
+    report = {'date': datetime.datetime.now().isoformat(timespec='seconds'),
+              'python': platform.python_version(),
+              'platform': platform.platform(),
+              'results': results}
+    with open(options.output, 'w') as output_file:
+        json.dump(report, output_file, indent=2)
+    print('Results written to', options.output)
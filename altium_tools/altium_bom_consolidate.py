@@ -0,0 +1,93 @@
+# coding: utf-8
+# The program merges Bills of Materials of several projects to one purchase list.
+# The build list is a tab separated file with a BOM file name and a number of boards
+# to build on every line, for example:
+# board_a.txt	40
+# board_b.txt	15
+# In the command line enter
+# python <Current Python File> <Build List File> [Output File]
+
+import csv
+import os.path
+import sys
+
+from altium_bom_reader import read_bom
+from altium_bom_to_bpi import aggregate_bom
+
+
+def read_build_list(input_file_name):
+
+    builds = []
+    with open(input_file_name, 'r', newline='') as input_file:
+        reader = csv.reader(input_file, delimiter='\t')  # use tab delimiter
+        for line_num, row in enumerate(reader, 1):
+            if not row or row[0].strip() == '' or row[0].startswith('#'):
+                continue
+            try:
+                boards = int(row[1])
+            except (IndexError, ValueError):
+                boards = 0
+            if boards <= 0:
+                raise ValueError('%s:%d: build quantity must be a positive integer' % (input_file_name, line_num))
+            # BOM paths are relative to the build list
+            bom_file_name = os.path.join(os.path.dirname(input_file_name), row[0].strip())
+            builds.append((bom_file_name, boards))
+    return builds
+
+
+def consolidate_boms(builds):
+
+    # Only one BOM is read at a time, so the memory depends on the number of unique parts.
+    # (part number, manufacturer) -> [label, total quantity, {build index: quantity}]
+    table = {}
+    for i, (bom_file_name, boards) in enumerate(builds):
+        for (part_number, manufacturer, label), qty in aggregate_bom(read_bom(bom_file_name)).items():
+            key = (part_number, manufacturer)
+            entry = table.get(key)
+            if entry is None:
+                entry = table[key] = [label, 0, {}]
+            elif entry[0] == '':
+                entry[0] = label
+            entry[1] += qty * boards
+            entry[2][i] = entry[2].get(i, 0) + qty * boards
+    return table
+
+
+def write_csv(builds, table, output_file_name):
+
+    with open(output_file_name, 'w', newline='') as output_file:
+        output_writer = csv.writer(output_file, delimiter='\t', quoting=csv.QUOTE_NONE, quotechar=None)
+
+        header = ['Part Number', 'Manufacturer', 'Label', 'Quantity']
+        for bom_file_name, boards in builds:
+            header.append(os.path.splitext(os.path.basename(bom_file_name))[0] + ' x' + str(boards))
+        output_writer.writerow(header)
+
+        num_builds = len(builds)
+        for (part_number, manufacturer), (label, total, per_build) in table.items():
+            row = [part_number, manufacturer, label, total]
+            row.extend(per_build.get(i, '') for i in range(num_builds))
+            output_writer.writerow(row)  # write data into csv file
+
+
+if __name__ == '__main__':
+
+    if len(sys.argv) not in (2, 3):
+        print("Usage: ", os.path.basename(sys.argv[0]), "<Build List File> [Output File]")
+        sys.exit(1)
+
+    build_list_file_name = sys.argv[1]
+    if len(sys.argv) == 3:
+        output_file_name = sys.argv[2]
+    else:
+        output_file_name = build_list_file_name[:-4] + '_purchase.txt'  # create file with "_purchase" postfix
+
+    try:
+        builds = read_build_list(build_list_file_name)
+    except ValueError as err:
+        print(err)
+        sys.exit(1)
+
+    table = consolidate_boms(builds)
+    write_csv(builds, table, output_file_name)
+    print('%d part(s) from %d BOM(s) written to %s' % (len(table), len(builds), output_file_name))
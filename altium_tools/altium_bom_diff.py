@@ -0,0 +1,101 @@
+# coding: utf-8
+# The program compares two revisions of Altium's Bill of Materials for ECO review.
+# The report lists parts added, removed and with changed quantity, and designators
+# moved from one part number to another. Report lines are tab separated:
+# ADDED/REMOVED/CHANGED <Part Number> <Manufacturer> <Qty A> <Qty B> <Designators Added> <Designators Removed>
+# MOVED <Designator> <Part Number A> <Manufacturer A> <Part Number B> <Manufacturer B>
+# In the command line enter
+# python <Current Python File> <BOM Revision A> <BOM Revision B> [Output File]
+
+import csv
+import os.path
+import sys
+
+from altium_bom_reader import read_bom, row_quantity, split_designators
+from altium_bom_to_loc import compress_designators, natural_key
+
+
+def index_bom(rows):
+
+    # part (part number, manufacturer) -> [designators, quantity] and designator -> part,
+    # the quantity is counted like in the BPI, so the lines without designators count too
+    parts = {}
+    designators = {}
+    for row in rows:
+        key = (row.part_number, row.manufacturer)
+        part = parts.get(key)
+        if part is None:
+            part = parts[key] = [[], 0]
+        for des in split_designators(row.designator):
+            part[0].append(des)
+            designators[des] = key
+        part[1] += row_quantity(row)
+    return parts, designators
+
+
+def diff_boms(rows_a, rows_b):
+
+    # Every revision is indexed once, then every lookup is a dictionary or set
+    # operation, so the change set is computed in linear time.
+    parts_a, designators_a = index_bom(rows_a)
+    parts_b, designators_b = index_bom(rows_b)
+
+    # changes are (change, part, designators A, designators B, quantity A, quantity B)
+    changes = []
+    for key, (des_a, qty_a) in parts_a.items():
+        part_b = parts_b.get(key)
+        if part_b is None:
+            changes.append(('REMOVED', key, des_a, [], qty_a, 0))
+            continue
+        des_b, qty_b = part_b
+        if qty_a != qty_b or len(des_a) != len(des_b) or set(des_a) != set(des_b):
+            changes.append(('CHANGED', key, des_a, des_b, qty_a, qty_b))
+    for key, (des_b, qty_b) in parts_b.items():
+        if key not in parts_a:
+            changes.append(('ADDED', key, [], des_b, 0, qty_b))
+
+    moves = []
+    for des, key_a in designators_a.items():
+        key_b = designators_b.get(des)
+        if key_b is not None and key_b != key_a:
+            moves.append((des, key_a, key_b))
+
+    return changes, moves
+
+
+def format_designators(designators):
+    return compress_designators(sorted((natural_key(des), des) for des in designators))
+
+
+def write_csv(changes, moves, output_file_name):
+
+    with open(output_file_name, 'w', newline='') as output_file:
+        output_writer = csv.writer(output_file, delimiter='\t', quoting=csv.QUOTE_NONE, quotechar=None)
+
+        for change, (part_number, mfr), des_a, des_b, qty_a, qty_b in changes:
+            set_a = set(des_a)
+            set_b = set(des_b)
+            output_writer.writerow([change, part_number, mfr, qty_a, qty_b,
+                                    format_designators(set_b - set_a),
+                                    format_designators(set_a - set_b)])  # write data into csv file
+
+        for des, (part_number_a, mfr_a), (part_number_b, mfr_b) in sorted(moves, key=lambda move: natural_key(move[0])):
+            output_writer.writerow(['MOVED', des, part_number_a, mfr_a, part_number_b, mfr_b])  # write data into csv file
+
+
+if __name__ == '__main__':
+
+    if len(sys.argv) not in (3, 4):
+        print("Usage: ", os.path.basename(sys.argv[0]), "<BOM Revision A> <BOM Revision B> [Output File]")
+        sys.exit(1)
+
+    input_file_name_a = sys.argv[1]
+    input_file_name_b = sys.argv[2]
+    if len(sys.argv) == 4:
+        output_file_name = sys.argv[3]
+    else:
+        output_file_name = input_file_name_b[:-4] + '_diff.txt'  # create file with "_diff" postfix
+
+    changes, moves = diff_boms(read_bom(input_file_name_a), read_bom(input_file_name_b))
+    write_csv(changes, moves, output_file_name)
+    print('%d part(s) changed, %d designator(s) moved' % (len(changes), len(moves)))
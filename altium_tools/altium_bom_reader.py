@@ -0,0 +1,134 @@
+# coding: utf-8
+# Streaming reader of Altium's Bill of Materials shared by the BOM converters.
+# The columns are mapped by the header titles, so their order and number
+# in the BOM template do not matter.
+
+import csv
+import sys
+from collections import namedtuple
+
+BomRow = namedtuple('BomRow', 'designator component_type part_number part_label manufacturer quantity')
+
+# Header titles accepted for every BomRow field in order of priority (lower case)
+BOM_COLUMNS = {
+    'designator': ('designator', 'reference', 'refdes'),
+    'component_type': ('component type', 'type', 'description'),
+    'part_number': ('part number', 'partnumber', 'manufacturer part number', 'comment'),
+    'part_label': ('part label', 'label', 'value'),
+    'manufacturer': ('manufacturer', 'manufacturer 1'),
+    'quantity': ('quantity', 'qty'),
+}
+
+# Number of the first lines where the header is searched for
+HEADER_SEARCH_LINES = 10
+
+# Number of lines to skip if the BOM has no header (legacy template)
+NUM_SKIP_LINES = 2
+
+
+def read_bom(input_file_name, require_header=False):
+    """ Reads Altium's BOM file and yields its lines one by one.
+
+    Args:
+        input_file_name: tab separated BOM file, '-' reads the standard input
+        require_header: raise ValueError if the file has no header with a
+            Designator column instead of reading it as the legacy template
+
+    Returns:
+        Generator of BomRow records
+    """
+    if input_file_name == '-':
+        yield from parse_bom(sys.stdin, require_header)
+    else:
+        with open(input_file_name, 'r', newline='') as input_file:
+            yield from parse_bom(input_file, require_header)
+
+
+def parse_bom(lines, require_header=False):
+    reader = csv.reader(lines, delimiter='\t')  # use tab delimiter
+
+    # look for the header in the first lines of the file
+    head = []
+    for row in reader:
+        head.append(row)
+        if len(head) == HEADER_SEARCH_LINES:
+            break
+
+    header_index = None
+    for i, row in enumerate(head):
+        titles = [cell.strip().lower() for cell in row]
+        if any(title in BOM_COLUMNS['designator'] for title in titles):
+            header_index = i
+            break
+
+    if header_index is None and require_header:
+        raise ValueError('no Designator column in the first %d lines, not a BOM' % HEADER_SEARCH_LINES)
+    if header_index is None:
+        # legacy template: fixed columns in BomRow order after NUM_SKIP_LINES
+        columns = list(range(len(BomRow._fields)))
+        head = head[NUM_SKIP_LINES:]
+    else:
+        columns = map_columns(head[header_index])
+        head = head[header_index + 1:]
+
+    for rows in (head, reader):
+        for row in rows:
+            record = make_row(row, columns)
+            if record is not None:
+                yield record
+
+
+def map_columns(header):
+    titles = {}
+    for i, cell in enumerate(header):
+        titles.setdefault(cell.strip().lower(), i)
+
+    columns = []
+    for field in BomRow._fields:
+        index = None
+        for title in BOM_COLUMNS[field]:
+            if title in titles:
+                index = titles[title]
+                break
+        columns.append(index)
+    return columns
+
+
+def make_row(row, columns):
+    num_cells = len(row)
+    cells = []
+    for i in columns:
+        if i is not None and i < num_cells:
+            cells.append(row[i].strip())
+        else:
+            cells.append('')
+
+    # skip empty lines
+    if not any(cells):
+        return None
+    return BomRow._make(cells)
+
+
+def split_designators(cell):
+
+    # a designator cell may contain several comma separated designators: "R1, R2"
+    designators = []
+    for des in cell.split(','):
+        des = des.strip()
+        if des != '':
+            designators.append(des)
+    return designators
+
+
+def row_quantity(row):
+
+    # Number of placements of a BOM line: the Quantity column of a grouped
+    # line ("R1, R2, R3" with Quantity 3), otherwise the number of its
+    # designators and 1 for a line without designators.
+    try:
+        quantity = int(row.quantity)
+        if quantity > 0:
+            return quantity
+    except ValueError:
+        pass
+    return max(len(split_designators(row.designator)), 1)
@@ -1,98 +1,55 @@
 # coding: utf-8
 # The program convert Altium's Bill of Materials to Bill to Purchase Items
 
-# TODO:
-# 1. The program skips some components, for example 51 Ohm resistor,
-# and all IC's.
-
 import csv
-import matplotlib.pyplot as plt
-from matplotlib.ticker import (MultipleLocator)
 import os.path
 import sys
 import time
 
-NUM_SKIP_LINES = 2
-
-designator = []
-component_type = []
-part_number = []
-part_label = []
-manufacturer = []
-quantity = []
-
-
-def read_bom_template(input_file_name):
-
-    # open reference data file for reading
-    input_file = open(input_file_name, 'r', newline='')
-    reader = csv.reader(input_file, delimiter='\t')  # use tab delimiter
+from altium_bom_reader import read_bom, row_quantity
 
-    # skip the header
-    for i in range(NUM_SKIP_LINES):
-        next(reader, None)
 
-    # read data from csv-file
-    for designator_, component_type_, part_number_, part_label_, manufacturer_, quantity_ in reader:
-        designator.append(designator_)
-        component_type.append(component_type_)
-        part_number.append(part_number_)
-        part_label.append(part_label_)
-        manufacturer.append(manufacturer_)
-        quantity.append(quantity_)
+def aggregate_bom(rows):
 
-    # close csv-file
-    input_file.close()
+    # Group BOM lines by (part number, manufacturer, label) in a single pass.
+    # The dictionary keeps insertion order, so purchase items come out in the
+    # order they first appear in the BOM. A grouped line (several designators
+    # in one line) counts all its placements.
+    parts = {}
+    for row in rows:
+        key = (row.part_number, row.manufacturer, row.part_label)
+        parts[key] = parts.get(key, 0) + row_quantity(row)
 
+    return parts
 
-def write_csv(designator, component_type, part_number, part_label, manufacturer, quantity):
 
-    output_file = open(input_file_name[:-4] + '_bpi.txt', 'w', newline='') # create file with "_out" postfix
-    output_writer = csv.writer(output_file, delimiter='\t', quoting = csv.QUOTE_NONE, escapechar='', quotechar='')
+def write_parts(parts, output_file_name):
 
-    cmp_rpt_cnt = []
+    with open(output_file_name, 'w', newline='') as output_file:
+        output_writer = csv.writer(output_file, delimiter='\t', quoting=csv.QUOTE_NONE, quotechar=None)
 
-    for pattern in part_number:
-        repeat_index = []
-        for j in range(len(part_number)):
-            if part_number[j] == pattern:
-                repeat_index.append(j)
-        print(repeat_index)
+        for (part_number_, mfr, label), qty in parts.items():
+            output_writer.writerow([part_number_,  '', '', mfr, '', qty, '', '', qty]) # write data into csv file
+            if label != '':
+                output_writer.writerow(['(' + str(label) + ')'])  # write data into csv file
 
-        cmp_rpt_cnt.append(repeat_index)
 
-    for pattern in cmp_rpt_cnt:
-        duplicate_count = 0
-        duplicate_index = []
-        for j in range(len(cmp_rpt_cnt)):
-            if cmp_rpt_cnt[j] == pattern:
-                duplicate_count += 1
-                if duplicate_count > 1:
-                    duplicate_index.append(j)
+def write_csv(rows, output_file_name):
+    write_parts(aggregate_bom(rows), output_file_name)
 
-        for i in duplicate_index:
-            cmp_rpt_cnt.pop(i)
 
-    cmp_rpt_cnt.pop(0)
-
-    for cmp_pn in cmp_rpt_cnt:
-        part_number_ = part_number[cmp_pn[0]]
-        qty = len(cmp_pn)
-        mfr = manufacturer[cmp_pn[0]]
-        if part_label[cmp_pn[0]] == '':
-            value = ''
-        else:
-            value = '(' + str(part_label[cmp_pn[0]]) + ')'
-        output_writer.writerow([part_number_,  '', '', mfr, '', qty, '', '', qty]) # write data into csv file
-        if value != '':
-            output_writer.writerow([value])  # write data into csv file
-  
-    output_file.close()  # close csv-file
+if __name__ == '__main__':
 
+    if len(sys.argv) not in (2, 3):
+        print("Usage: ", os.path.basename(sys.argv[0]), "<BOM File> [Output File]")
+        sys.exit(1)
 
-if __name__ == '__main__':
     input_file_name = sys.argv[1]
-    read_bom_template(input_file_name)
+    if len(sys.argv) == 3:
+        output_file_name = sys.argv[2]
+    else:
+        output_file_name = input_file_name[:-4] + '_bpi.txt'  # create file with "_bpi" postfix
+
     t = time.time()
-    write_csv(designator, component_type, part_number, part_label, manufacturer, quantity)
+    write_csv(read_bom(input_file_name), output_file_name)
     print("%.6f" % (time.time()-t))
@@ -2,92 +2,113 @@
 # The program convert Altium's Bill of Materials to List of Components
 
 import csv
-import matplotlib.pyplot as plt
-from matplotlib.ticker import (MultipleLocator)
 import os.path
+import re
 import sys
 
-NUM_SKIP_LINES = 2
-
-designator = []
-component_type = []
-part_number = []
-part_label = []
-manufacturer = []
-quantity = []
-
-
-def read_bom_template(input_file_name):
-
-    # open reference data file for reading
-    input_file = open(input_file_name, 'r', newline='')
-    reader = csv.reader(input_file, delimiter='\t')  # use tab delimiter
-
-    # skip the header
-    for i in range(NUM_SKIP_LINES):
-        next(reader, None)
-
-    # read data from csv-file
-    for designator_, component_type_, part_number_, part_label_, manufacturer_, quantity_ in reader:
-        designator.append(designator_)
-        component_type.append(component_type_)
-        part_number.append(part_number_)
-        part_label.append(part_label_)
-        manufacturer.append(manufacturer_)
-        quantity.append(quantity_)
-
-    # close csv-file
-    input_file.close()
-
-
-def write_csv(designator, component_type, part_number, part_label, manufacturer, quantity):
-
-    output_file = open(input_file_name[:-4] + '_loc.txt', 'w', newline='') # create file with "_out" postfix
-    output_writer = csv.writer(output_file, delimiter='\t', quoting = csv.QUOTE_NONE, escapechar='', quotechar='')
+from altium_bom_reader import read_bom, row_quantity, split_designators
+
+# Designators shorter than this run length are listed one by one: "R1, R2"
+MIN_RANGE_LENGTH = 3
+
+simple_designator = re.compile(r'(\D*)(\d+)')
+natural_split = re.compile(r'(\d+)')
+
+
+def natural_key(designator):
+
+    # "R10" -> ['R', 10, ''], so that R2 goes before R10
+    match = simple_designator.fullmatch(designator)
+    if match:
+        return [match[1], int(match[2]), '']
+    key = natural_split.split(designator)
+    key[1::2] = map(int, key[1::2])
+    return key
+
+
+def group_components(rows):
+
+    # Collect designators of every part (part number, label, manufacturer)
+    # in one pass, the order of the lines in the BOM does not matter.
+    # The quantity is counted like in the BPI: a grouped line counts all
+    # its placements.
+    parts = {}
+    for row in rows:
+        key = (row.part_number, row.part_label, row.manufacturer)
+        part = parts.get(key)
+        if part is None:
+            part = parts[key] = [[], 0]
+        part[0].extend(split_designators(row.designator))
+        part[1] += row_quantity(row)
+
+    # Natural sort of designators inside every part and of parts by their
+    # first designator. Designators are kept with their sort keys as
+    # (key, designator) pairs for compress_designators().
+    components = []
+    for key, (designators, qty) in parts.items():
+        designators = [(natural_key(des), des) for des in designators]
+        designators.sort()
+        components.append((key, designators, qty))
+    components.sort(key=lambda component: component[1][0][0] if component[1] else [])
+
+    return components
+
+
+def compress_designators(designators):
+
+    # Naturally sorted designators ['R1', 'R2', 'R3', 'R5'] -> "R1-R3, R5".
+    # Only designators which differ by the trailing number form a range.
+    runs = []
+    prefix = None
+    number = None
+    for key, des in designators:
+        if len(key) == 3 and key[2] == '':
+            if runs and key[0] == prefix and key[1] == number + 1:
+                runs[-1].append(des)
+            else:
+                runs.append([des])
+            prefix, number = key[0], key[1]
+        else:
+            runs.append([des])
+            prefix = number = None
 
-    cnt = 0
+    ref_des = []
+    for run in runs:
+        if len(run) >= MIN_RANGE_LENGTH:
+            ref_des.append(run[0] + '-' + run[-1])
+        else:
+            ref_des.extend(run)
+    return ', '.join(ref_des)
 
-    ref_des = ''
 
-    for i in range(len(designator)):
+def write_components(components, output_file_name):
 
-        if i < (len(designator) - 2):
-            if part_number[i] != part_number[i+1]:
-                if cnt == 0:
-                    ref_des = designator[i]
-                if part_label[i] == '':
-                    value = str(part_number[i]) + ' ' + str(manufacturer[i])
-                else:
-                    value = str(part_number[i]) + ' (' + str(part_label[i]) + ') ' + str(manufacturer[i])
-                qty = str(int(quantity[i]) + cnt)
-                output_writer.writerow([ref_des, value, qty]) # write data into csv file
-                ref_des = ''
-                cnt = 0
+    with open(output_file_name, 'w', newline='') as output_file:
+        output_writer = csv.writer(output_file, delimiter='\t', quoting=csv.QUOTE_NONE, quotechar=None)
 
+        for (part_number, part_label, manufacturer), designators, qty in components:
+            ref_des = compress_designators(designators)
+            if part_label == '':
+                value = str(part_number) + ' ' + str(manufacturer)
             else:
-                cnt += 1
-                if cnt == 1:
-                    ref_des_start = str(designator[i])
-                    ref_des_stop = str(designator[i+1])
-                    ref_des = ref_des_start + ', ' + ref_des_stop
-                else:
-                    ref_des_stop = str(designator[i+1])
-                    ref_des = ref_des_start + ' - ' + ref_des_stop
-        else:
-            if cnt == 0:
-                ref_des = designator[i]
-            if part_label[i] == '':
-                value = str(part_number[i]) + ' ' + str(manufacturer[i])
-            else:
-                value = str(part_number[i]) + ' (' + str(part_label[i]) + ') ' + str(manufacturer[i])
-            qty = str(int(quantity[i]) + cnt)
-            output_writer.writerow([ref_des, value, qty])  # write data into csv file
+                value = str(part_number) + ' (' + str(part_label) + ') ' + str(manufacturer)
+            output_writer.writerow([ref_des, value, str(qty)])  # write data into csv file
+
 
-    output_file.close() # close csv-file
+def write_csv(rows, output_file_name):
+    write_components(group_components(rows), output_file_name)
 
 
 if __name__ == '__main__':
 
+    if len(sys.argv) not in (2, 3):
+        print("Usage: ", os.path.basename(sys.argv[0]), "<BOM File> [Output File]")
+        sys.exit(1)
+
     input_file_name = sys.argv[1]
-    read_bom_template(input_file_name)
-    write_csv(designator, component_type, part_number, part_label, manufacturer, quantity)
+    if len(sys.argv) == 3:
+        output_file_name = sys.argv[2]
+    else:
+        output_file_name = input_file_name[:-4] + '_loc.txt'  # create file with "_loc" postfix
+
+    write_csv(read_bom(input_file_name), output_file_name)
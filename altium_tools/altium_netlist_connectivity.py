@@ -0,0 +1,148 @@
+# coding:utf8
+
+
+# Connectivity queries over Altium Designer WireList netlist
+# Nets joined by bridging parts (net ties, 0 Ohm resistors, jumpers) are merged into
+# electrical nodes with union-find, so the queries are dictionary lookups.
+# In the command line enter
+# python <Current Python File> <Netlist File> [--bridge R15 NT*] [--pin D12:PA5] [--common D12 X3] [--no-mmap]
+
+
+import argparse
+from fnmatch import fnmatchcase
+
+from altium_netlist_parsing import read_netlist_index
+
+
+def find(parent, net):
+
+    # root of the net with path halving
+    while parent[net] != net:
+        parent[net] = parent[parent[net]]
+        net = parent[net]
+    return net
+
+
+def union(parent, size, net_a, net_b):
+
+    root_a = find(parent, net_a)
+    root_b = find(parent, net_b)
+    if root_a == root_b:
+        return
+    if size[root_a] < size[root_b]:
+        root_a, root_b = root_b, root_a
+    parent[root_b] = root_a
+    size[root_a] += size[root_b]
+
+
+def build_connectivity(index, bridges=()):
+
+    # Returns the connectivity model:
+    # node: net -> electrical node (root net) after the bridging parts are shorted
+    # node_nets: node -> nets of the node
+    # component_nets: designator -> set of nets touching the component
+    # pin_names: designator -> {pin name: pin number}
+    components, nets = index
+
+    parent = {net: net for net in nets}
+    size = dict.fromkeys(nets, 1)
+    for designator, pins in components.items():
+        if any(fnmatchcase(designator, pattern) for pattern in bridges):
+            bridged = [pin[1] for pin in pins.values()]
+            for net in bridged[1:]:
+                union(parent, size, bridged[0], net)
+
+    node = {net: find(parent, net) for net in nets}
+    node_nets = {}
+    for net, root in node.items():
+        node_nets.setdefault(root, []).append(net)
+
+    component_nets = {}
+    pin_names = {}
+    for designator, pins in components.items():
+        component_nets[designator] = {pin[1] for pin in pins.values()}
+        pin_names[designator] = {pin[2]: pin[0] for pin in pins.values()}
+
+    return {'index': index, 'node': node, 'node_nets': node_nets,
+            'component_nets': component_nets, 'pin_names': pin_names}
+
+
+def pin_net(connectivity, designator, pin):
+
+    # pin is given by its number or name: D12:23 or D12:PA5
+    components, nets = connectivity['index']
+    pins = components.get(designator, {})
+    if pin not in pins:
+        pin = connectivity['pin_names'].get(designator, {}).get(pin)
+    if pin not in pins:
+        return None
+    return pins[pin][1]
+
+
+def connected_pins(connectivity, designator, pin):
+
+    # all pins electrically connected to the pin through the bridging parts
+    net = pin_net(connectivity, designator, pin)
+    if net is None:
+        return []
+    components, nets = connectivity['index']
+    result = []
+    for node_net in connectivity['node_nets'][connectivity['node'][net]]:
+        for des, pin_num in nets[node_net]:
+            result.append((des, pin_num, components[des][pin_num][2], node_net))
+    return result
+
+
+def is_connected(connectivity, pin_a, pin_b):
+
+    # pins are (designator, pin number or name) pairs
+    net_a = pin_net(connectivity, *pin_a)
+    net_b = pin_net(connectivity, *pin_b)
+    if net_a is None or net_b is None:
+        return False
+    return connectivity['node'][net_a] == connectivity['node'][net_b]
+
+
+def common_nets(connectivity, designators):
+
+    # nets touching every one of the components
+    component_nets = connectivity['component_nets']
+    sets = sorted((component_nets.get(des, set()) for des in designators), key=len)
+    if not sets:
+        return []
+    result = set(sets[0])
+    for nets in sets[1:]:
+        result &= nets
+    return sorted(result)
+
+
+def get_arguments():
+
+    parser = argparse.ArgumentParser(description='Connectivity queries over WireList netlist')
+    parser.add_argument('netlist', help='WireList netlist file')
+    parser.add_argument('--bridge', nargs='+', default=[],
+                        help='designators or patterns of bridging parts: net ties, 0 Ohm resistors')
+    parser.add_argument('--pin', nargs='+', default=[],
+                        help='list pins connected to DESIGNATOR:PIN (number or name)')
+    parser.add_argument('--common', nargs='+', default=[],
+                        help='list nets touching all the given components')
+    parser.add_argument('--no-mmap', dest='use_mmap', action='store_false',
+                        help='read the netlist as text instead of memory-mapping it')
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+
+    options = get_arguments()
+    connectivity = build_connectivity(read_netlist_index(options.netlist, use_mmap=options.use_mmap), options.bridge)
+
+    for spec in options.pin:
+        designator, _, pin = spec.partition(':')
+        print(spec + ':')
+        for des, pin_num, pin_name, net in connected_pins(connectivity, designator, pin):
+            print('    ' + des + '\t' + pin_num + '\t' + pin_name + '\t' + net)
+
+    if options.common:
+        print(' '.join(options.common) + ':')
+        for net in common_nets(connectivity, options.common):
+            print('    ' + net)
@@ -5,126 +5,431 @@
 # This Python script is using to parse the netlist form Altium Designer and creates definitions file for MCU firmware.
 # It's necessary to do from Altium Designer:
 # File > Export > NetList Schematic > Scope: Project > NetList Format: WireList netlist
-
-
+# In the command line enter
+# python <Current Python File> <Netlist File> <Output Directory> [Designator or Pattern ...] [--rules <Rules File>] [--no-mmap]
+# By default definitions are written for every D* component with GPIO pins.
+# With --watch the script keeps running and regenerates the definitions whenever the netlist is exported again,
+# the .DEF files are rewritten only if their content changes.
+# The netlist is memory-mapped and scanned as bytes, --no-mmap reads it as text instead.
+#
+# Rules file lists pin filter rules, one per line: <include|exclude> <field> <value>
+# Fields: type, name, net, designator (exact value) and name_re, net_re (regular expression).
+# A pin is kept if no exclude rule matches it and, if there are include rules, one of them matches it:
+# exclude type POWER
+# exclude name BOOT0
+# include net_re ^MCU_
+# A comment starts with # at the beginning of a line or after a space, so a regular expression may contain #.
+
+
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+from fnmatch import fnmatchcase
+from functools import partial
+import hashlib
+import locale
+import mmap
 import os
+import re
+import sys
+import time
 from colorama import Fore, Back, Style
 from colorama import init
 init(autoreset=True)
 
 
+NETLIST_FILE = "F:\\1\\STVF.467769.001_1.NET"
+
+# components to generate definitions for if no designators are given
+DEFAULT_DESIGNATORS = ('D*',)
+
+# GPIO pin name: port letter and pin number, e.g. PA5
+gpio_pin = re.compile(r'P[A-Z]\d+')
+
+# the text parser opens the netlist in the default encoding, the scanner decodes with the same one
+NETLIST_ENCODING = locale.getpreferredencoding(False)
+
+# WireList lines for the byte-level scanner: net header "[00001] NET_NAME" (group 1)
+# or pin line "        D12    23    PA5    I/O    ..." (groups 2-5, the part value is not needed)
+netlist_line = re.compile(rb'^(?:[ \t]*\[[^\]\r\n]*\][ \t]*(\S*)'
+                          rb'|[ \t]+(\S+)[ \t]+(\S+)[ \t]+(\S+)[ \t]+(\S+))', re.M)
+
+# watch mode: netlist polling period in seconds and hashing chunk size
+WATCH_INTERVAL = 1.0
+HASH_CHUNK_SIZE = 1 << 20
+
+# pin row fields checked by the filter rules
+RULE_FIELDS = {'net': 1, 'name': 2, 'type': 3}
+RULE_ACTIONS = ('include', 'exclude')
+# comment of the rules file: "#" at the line start or after a space, "net_re ^#RST" keeps its value
+rule_comment = re.compile(r'(?:^|\s)#.*')
+
 exclude_pins = []
 service_pins = ('NRST', 'BOOT0', 'PB2', 'HSEI', 'HSEO', 'LSEI', 'LSEO', 'PA13', 'PA14', 'PB3')
 
 
-def parse_netlist(designator='D12'):
-
-    # Here we are copying main.c file to main.c.tmp while line begining with "WriteRegSYNTH" has to be appear
-    # When the line begining with "WriteRegSYNTH" has met we replace it with own REG_DAT starting from index 7 to 0
-    # Las we replace main.c file with main.c.tmp and delete the last
-
-    pinout_tmp = []
-    with open("F:\\1\\STVF.467769.001_1.NET", "r") as file:
-            string = " "
-            net_label = " "
-            while string != "":
-                string = file.readline()
-                if "[" in string:
-                    net_label_tmp = string.split(' ')
-                    net_label = net_label_tmp[1]
-                    #print(net_label[1])
-                elif ("        " + designator) in string:
-                    cpin = " ".join(string.split())
-                    pin = cpin.split()
-                    pin.insert(0, net_label)
-                    pin.pop(1)
-                    pin_num = pin.pop(1)
-                    pin.pop()
-                    pin.insert(0, pin_num)
-                    pin = [p.rstrip() for p in pin]
-                    pinout_tmp.append(pin)
-    pinout_tmp.pop(0)
-    l = len(pinout_tmp)
-
-    pinout = []
-    for i in range(l):
-        pinout.append(i)
-
-    # print(pinout_tmp)
-
-    # for p in pinout_tmp:
-    #     pin_num = int(p[0])
-    #     p[0] = pin_num
-
-    pinout_tmp.sort()
+def parse_netlist_index(path=NETLIST_FILE, designators=None):
+
+    # One pass over the WireList netlist builds two indexes:
+    # components: designator -> {pin number: [pin number, net, pin name, pin type]}
+    # nets: net -> [(designator, pin number), ...]
+    # Net header looks like "[00001] NET_NAME", pin lines below it look like
+    # "        D12    23    PA5    I/O    STM32F407VGT6". The lines before
+    # the first net header (component list) are skipped.
+    # This is the text parser of --no-mmap, for the files the memory mapping
+    # fails on (some network drives), scan_netlist_index() is the default.
+    components = {}
+    nets = {}
+    if designators is not None:
+        designators = set(designators)
+    with open(path, "r") as file:
+        net_label = None
+        pins = None
+        for string in file:
+            if string.lstrip().startswith("["):
+                net_label_tmp = string.split()
+                net_label = net_label_tmp[1] if len(net_label_tmp) > 1 else ''
+                pins = None
+            elif net_label is not None and string[:1] in (' ', '\t'):
+                pin = string.split()
+                if len(pin) < 4:
+                    continue
+                designator, pin_num, pin_name, pin_type = pin[:4]
+                if designators is not None and designator not in designators:
+                    continue
+                if pins is None:
+                    pins = nets.setdefault(net_label, [])
+                component = components.get(designator)
+                if component is None:
+                    component = components[designator] = {}
+                component[pin_num] = [pin_num, net_label, pin_name, pin_type]
+                pins.append((designator, pin_num))
+
+    return components, nets
+
+
+def scan_netlist_index(path=NETLIST_FILE, designators=None):
+
+    # Same indexes as parse_netlist_index() built by the byte-level scanner:
+    # the file is memory-mapped and only the fields of the matched lines are
+    # decoded. If designators are given, only their pins are indexed and the
+    # memory doesn't depend on the netlist size.
+    components = {}
+    nets = {}
+    if designators is not None:
+        designators = {des.encode(NETLIST_ENCODING) for des in designators}
+
+    with open(path, "rb") as file:
+        if os.fstat(file.fileno()).st_size == 0:
+            return components, nets
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            net_label = None
+            for match in netlist_line.finditer(data):
+                net, designator, pin_num, pin_name, pin_type = match.groups()
+                if net is not None:
+                    net_label = net
+                    pins = None
+                elif net_label is not None and (designators is None or designator in designators):
+                    if pins is None:
+                        net_name = net_label.decode(NETLIST_ENCODING)
+                        pins = nets.setdefault(net_name, [])
+                    designator = designator.decode(NETLIST_ENCODING)
+                    pin_num = pin_num.decode(NETLIST_ENCODING)
+                    component = components.get(designator)
+                    if component is None:
+                        component = components[designator] = {}
+                    component[pin_num] = [pin_num, net_name, pin_name.decode(NETLIST_ENCODING),
+                                          pin_type.decode(NETLIST_ENCODING)]
+                    pins.append((designator, pin_num))
+
+    return components, nets
+
+
+def read_netlist_index(path=NETLIST_FILE, designators=None, use_mmap=True):
+    if use_mmap:
+        return scan_netlist_index(path, designators)
+    return parse_netlist_index(path, designators)
+
+
+def get_pinout(index, designator):
+
+    # pinout of the component sorted by pin number
+    components, nets = index
+    return sorted(components.get(designator, {}).values())
+
+
+def parse_netlist(designator='D12', path=NETLIST_FILE):
+
+    pinout_tmp = get_pinout(scan_netlist_index(path, [designator]), designator)
 
     print(pinout_tmp)
 
     return pinout_tmp
 
 
-def clear_pinout(pinout, service_pins, clear_power_nets='yes', clear_passive_nets='yes', exclude=exclude_pins):
+def compile_rules(rules):
+
+    # Rules are (action, field, value) triples. Exact values of every action go
+    # to sets, so a pin is checked against them with a few lookups. Regular
+    # expressions are compiled one by one to a list per field: each keeps its
+    # own inline flags, e.g. (?i)^mcu_.
+    compiled = {}
+    for action in RULE_ACTIONS:
+        compiled[action] = {'designator': set(), 'net': set(), 'name': set(), 'type': set()}
+    for action, field, value in rules:
+        if action not in RULE_ACTIONS:
+            raise ValueError('unknown rule action: ' + action)
+        if field.endswith('_re') and field[:-3] in RULE_FIELDS:
+            compiled[action].setdefault(field, []).append(re.compile(value))
+        elif field in compiled[action]:
+            compiled[action][field].add(value)
+        else:
+            raise ValueError('unknown rule field: ' + field)
+    return compiled
+
+
+def load_rules(path):
+
+    rules = []
+    with open(path, "r") as file:
+        for line_num, string in enumerate(file, 1):
+            string = rule_comment.sub('', string, 1).strip()
+            if string == '':
+                continue
+            rule = string.split(None, 2)
+            if len(rule) != 3:
+                raise ValueError(path + ':' + str(line_num) + ': rule has to be <action> <field> <value>')
+            rules.append(rule)
+    return compile_rules(rules)
+
+
+def match_rules(group, pin, designator):
+    if designator in group['designator']:
+        return True
+    for field, i in RULE_FIELDS.items():
+        if pin[i] in group[field]:
+            return True
+        for pattern in group.get(field + '_re', ()):
+            if pattern.search(pin[i]):
+                return True
+    return False
+
+
+def filter_pinout(pinout, rules, designator=None):
+
+    # one pass over the pinout applies all the rules
+    exclude = rules['exclude']
+    include = rules['include']
+    has_include = any(include.values())
     pinout_clr = []
     for pin in pinout:
-        if pin[3] == 'POWER' and clear_power_nets == 'yes':
-            pass
-        elif pin[3] == 'PASSIVE' and clear_passive_nets == 'yes':
-            pass
-        else:
-            pinout_clr.append(pin)
-
-    pname = []
-    for pin in pinout_clr:
-        pname.append(pin[2])
-
-    service_pin_index = []
-    for p in service_pins:
-        try:
-            idx = pname.index(p)
-            service_pin_index.append(idx)
-        except ValueError:
-            pass
-
-    service_pin_index.sort()
-
-    i = 0
-    for idx in service_pin_index:
-        idx -= i
-        pinout_clr.pop(idx)
-        i += 1
-
+        if match_rules(exclude, pin, designator):
+            continue
+        if has_include and not match_rules(include, pin, designator):
+            continue
+        pinout_clr.append(pin)
     return pinout_clr
 
 
-def compose_definitions(pinout):
-    with open("F:\\1\\STVF.467769.001_1.DEF", "w") as file:
-        for pin in pinout:
+def clear_pinout(pinout, service_pins, clear_power_nets='yes', clear_passive_nets='yes', exclude=exclude_pins):
+    rules = []
+    if clear_power_nets == 'yes':
+        rules.append(('exclude', 'type', 'POWER'))
+    if clear_passive_nets == 'yes':
+        rules.append(('exclude', 'type', 'PASSIVE'))
+    for name in list(service_pins) + list(exclude):
+        rules.append(('exclude', 'name', name))
+    return filter_pinout(pinout, compile_rules(rules))
+
+
+def format_definitions(pinout):
+    strings = []
+    for pin in pinout:
 
-            pin_num = pin[2]
-            pin_num = pin_num[2:]
-            pin_name = pin[1]
-            pin_name = pin_name[4:]
-            string = '#define ' + pin_name + '_Pin' + ' GPIO_PIN_' + pin_num + '\n'
-            file.write(string)
-            print(string)
+        pin_num = pin[2]
+        pin_num = pin_num[2:]
+        pin_name = pin[1]
+        pin_name = pin_name[4:]
+        strings.append('#define ' + pin_name + '_Pin' + ' GPIO_PIN_' + pin_num + '\n')
+
+        pin_port = pin[2]
+        pin_port = pin_port[1]
+        strings.append('#define ' + pin_name + '_GPIO_Port' + ' GPIO' + pin_port + '\n')
+
+        strings.append('\n')
+    return ''.join(strings)
+
+
+def compose_definitions(pinout, path, verbose=True):
+
+    # The file is rewritten only if its content changes, so the firmware
+    # depending on it is not rebuilt for nothing. Returns True if written.
+    definitions = format_definitions(pinout)
+    if verbose:
+        print(definitions)
+    try:
+        with open(path, "r") as file:
+            if file.read() == definitions:
+                return False
+    except FileNotFoundError:
+        pass
+    with open(path, "w") as file:
+        file.write(definitions)
+    return True
+
+
+def select_components(index, patterns=DEFAULT_DESIGNATORS):
+
+    # components matching any of the designator patterns and having GPIO pins
+    components, nets = index
+    selected = []
+    for designator, pins in components.items():
+        if any(fnmatchcase(designator, pattern) for pattern in patterns):
+            if any(gpio_pin.fullmatch(pin[2]) for pin in pins.values()):
+                selected.append(designator)
+    selected.sort()
+    return selected
+
+
+def write_component_definitions(index, output_dir, base_name, rules, designator):
+
+    if rules is None:
+        pinout = clear_pinout(get_pinout(index, designator), service_pins)
+    else:
+        pinout = filter_pinout(get_pinout(index, designator), rules, designator)
+    pinout = [pin for pin in pinout if gpio_pin.fullmatch(pin[2])]
+    path = os.path.join(output_dir, base_name + '_' + designator + '.DEF')
+    written = compose_definitions(pinout, path, verbose=False)
+    return designator, path, pinout, written
+
+
+def write_definitions(index, designators, output_dir, base_name, rules=None):
+
+    # the netlist is parsed once, the headers of the components are written in parallel
+    write = partial(write_component_definitions, index, output_dir, base_name, rules)
+    with ThreadPoolExecutor() as executor:
+        return list(executor.map(write, designators))
+
+
+def generate_definitions(netlist_file, output_dir, patterns, rules=None, use_mmap=True):
+
+    index = read_netlist_index(netlist_file, use_mmap=use_mmap)
+    designators = select_components(index, patterns)
+    if not designators:
+        return []
+    os.makedirs(output_dir, exist_ok=True)
+    base_name = os.path.splitext(os.path.basename(netlist_file))[0]
+    return write_definitions(index, designators, output_dir, base_name, rules)
+
+
+def file_hash(path):
+    digest = hashlib.sha1()
+    with open(path, "rb") as file:
+        for chunk in iter(partial(file.read, HASH_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def diff_pinouts(pinout_old, pinout_new):
+
+    # pins added (+), removed (-) and changed (~) by pin number
+    pins_old = {pin[0]: pin for pin in pinout_old}
+    pins_new = {pin[0]: pin for pin in pinout_new}
+    changes = []
+    for pin_num, pin in pins_new.items():
+        pin_old = pins_old.get(pin_num)
+        if pin_old is None:
+            changes.append('+ ' + ' '.join(pin))
+        elif pin_old != pin:
+            changes.append('~ ' + ' '.join(pin_old) + ' -> ' + ' '.join(pin))
+    for pin_num, pin in pins_old.items():
+        if pin_num not in pins_new:
+            changes.append('- ' + ' '.join(pin))
+    return changes
+
+
+def print_results(results, pinouts):
+    for designator, path, pinout, written in results:
+        if written:
+            print(Fore.GREEN + designator + ': ' + str(len(pinout)) + ' pins -> ' + path)
+        else:
+            print(designator + ': ' + str(len(pinout)) + ' pins, ' + path + ' is up to date')
+        if designator in pinouts:
+            for change in diff_pinouts(pinouts[designator], pinout):
+                print(Fore.CYAN + '    ' + change)
+        pinouts[designator] = pinout
+
+
+def watch_netlist(netlist_file, output_dir, patterns, rules=None, interval=WATCH_INTERVAL, use_mmap=True):
+
+    # Only the file status is polled while idle. The netlist is hashed when its
+    # mtime or size changes and parsed again only if the content has changed.
+    # Altium writes the export in several steps, so the file is read only after
+    # (mtime, size) has stayed the same for two polls in a row. A file deleted
+    # or locked in the meantime is tried again on the next poll.
+    signature = None
+    last_signature = None
+    digest = None
+    pinouts = {}
+    while True:
+        try:
+            stat = os.stat(netlist_file)
+            new_signature = (stat.st_mtime_ns, stat.st_size)
+            if new_signature == last_signature and new_signature != signature:
+                new_digest = file_hash(netlist_file)
+                if new_digest != digest:
+                    print(time.strftime('%H:%M:%S') + ' ' + netlist_file + ' changed')
+                    print_results(generate_definitions(netlist_file, output_dir, patterns, rules, use_mmap), pinouts)
+                    digest = new_digest
+                signature = new_signature
+        except OSError:
+            # Altium may be rewriting the file
+            new_signature = None
+        last_signature = new_signature
+        time.sleep(interval)
+
+
+def get_arguments():
+
+    parser = argparse.ArgumentParser(description='Pin definitions for MCU firmware from WireList netlist')
+    parser.add_argument('netlist', help='WireList netlist file')
+    parser.add_argument('output_dir', help='directory for the .DEF files')
+    parser.add_argument('designators', nargs='*', default=list(DEFAULT_DESIGNATORS),
+                        help='designators or patterns of the components')
+    parser.add_argument('--rules', default=None,
+                        help='pin filter rules file, power, passive and service pins are removed by default')
+    parser.add_argument('--watch', nargs='?', type=float, const=WATCH_INTERVAL, default=None, metavar='SECONDS',
+                        help='keep running and regenerate the definitions when the netlist changes')
+    parser.add_argument('--no-mmap', dest='use_mmap', action='store_false',
+                        help='read the netlist as text instead of memory-mapping it')
+    return parser.parse_args()
 
-            pin_port = pin[2]
-            pin_port = pin_port[1]
-            string = '#define ' + pin_name + '_GPIO_Port' + ' GPIO' + pin_port + '\n'
-            file.write(string)
-            print(string)
 
-            string = '\n'
-            file.write(string)
-            print(string)
+if __name__ == '__main__':
 
+    options = get_arguments()
+    netlist_file = options.netlist
+    output_dir = options.output_dir
+    patterns = options.designators
 
-if __name__ == '__main__':
+    rules = None
+    if options.rules is not None:
+        try:
+            rules = load_rules(options.rules)
+        except (OSError, ValueError, re.error) as err:
+            print(Fore.RED + str(err))
+            sys.exit(1)
 
-    pinout = parse_netlist('D12')
-    pinout = clear_pinout(pinout, service_pins)
-    print(pinout)
-    compose_definitions(pinout)
+    if options.watch is not None:
+        try:
+            watch_netlist(netlist_file, output_dir, patterns, rules, options.watch, options.use_mmap)
+        except KeyboardInterrupt:
+            sys.exit(0)
+
+    results = generate_definitions(netlist_file, output_dir, patterns, rules, options.use_mmap)
+    if not results:
+        print(Fore.RED + 'No components with GPIO pins match ' + ' '.join(patterns))
+        sys.exit(1)
+    print_results(results, {})
 
     # print(' ')
     # print(Fore.CYAN + Style.BRIGHT + 'Given:')
@@ -1,4 +1,12 @@
-﻿import fitz
+﻿from concurrent.futures import ProcessPoolExecutor
+import hashlib
+import json
+import os
+import tempfile
+
+import fitz
+
+from stm32_pinout import package_title
 
 # file = 'F://components//STMicroelectronics//STM32F4 Series//STM32F407VG Datasheet.pdf'
 # file = 'D://components//STMicroelectronics//STM32F4 Series//STM32F407VG Datasheet.pdf'
@@ -6,6 +14,10 @@ file = '..//..//..//components//STMicroelectronics//STM32F4 Series//STM32F407VG
 pinout_tmp = 'altium_tools//pinout.tmp'
 altfnc_tmp = 'altium_tools//altfnc.tmp'
 
+# on-disk cache of page extraction results keyed by PDF content hash, page and method
+cache_dir = 'altium_tools//pdf_cache'
+CACHE_MAX_SIZE = 256 * 2**20  # least recently used entries are evicted above this size
+
 PINOUT_PAGE_START = 46
 PINOUT_PAGE_STOP = 58
 PINOUT_STRING_START = 2
@@ -14,41 +26,222 @@ ALTFNC_PAGE_START = 61
 ALTFNC_PAGE_STOP = 69
 ALTFNC_STRING_START = 2
 
+# keywords of the per-page text index (lower case)
+PINOUT_KEYWORDS = ('pin definitions', 'pin and ball definitions')
+ALTFNC_KEYWORDS = ('alternate function mapping',)
+TABLE_KEYWORDS = ('eventout', 'af15')
+
 def main(path, cmd='stm32'):
     if cmd == 'stm32':
-        pinout = parse_stm32_pinout(path)
-        af = parse_stm32_alternate_fn(path)
+        pinout_pages, altfnc_pages = find_stm32_pages(path)
+        pinout = parse_stm32_pinout(path, pages=pinout_pages)
+        af = parse_stm32_alternate_fn(path, pages=altfnc_pages)
         print(pinout)
     else:
         pass
 
 
-def parse_stm32_pinout(path):
-    acc = []
-    header = ['LQFP-64', 'WLCSP-90', 'LQFP-100', 'LQFP-144', 'UFBGA-176', 'LQFP-176',
-              'Pin name', 'Pin type', 'Notes', 'Alternate functions', 'Additional functions']
-    acc.append(header)
-    with open(pinout_tmp, "w") as fw:
+def pdf_digest(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(2**20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def cache_path(digest, num, method):
+    # num is a page number or 'all' for the entries of the whole PDF
+    return os.path.join(cache_dir, '%s_%s_%s.json' % (digest, num, method))
+
+
+def cache_read(digest, num, method):
+    path = cache_path(digest, num, method)
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            value = json.load(f)
+        os.utime(path)  # mark as recently used
+        return value
+    except (OSError, ValueError):
+        return None
+
+
+def cache_write(digest, num, method, value):
+    # unique temporary name: several workers may extract the same PDF at once
+    os.makedirs(cache_dir, exist_ok=True)
+    fd, part_path = tempfile.mkstemp(suffix='.part', dir=cache_dir)
+    try:
+        with open(fd, 'w', encoding='utf-8') as f:
+            json.dump(value, f, ensure_ascii=False)
+        os.replace(part_path, cache_path(digest, num, method))
+    except BaseException:
+        try:
+            os.remove(part_path)
+        except OSError:
+            pass
+        raise
+
+
+def cache_evict(max_size=CACHE_MAX_SIZE):
+    # remove least recently used entries until the cache fits max_size
+    # other processes share the cache, an entry removed by them is skipped
+    try:
+        scanned = [e for e in os.scandir(cache_dir) if e.name.endswith('.json')]
+    except OSError:
+        return
+    entries = []
+    for e in scanned:
+        try:
+            st = e.stat()
+        except OSError:
+            continue
+        entries.append((st.st_mtime, st.st_size, e.path))
+    size = sum(e[1] for e in entries)
+    for mtime, entry_size, path in sorted(entries):
+        if size <= max_size:
+            break
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+        size -= entry_size
+
+
+def extract_page(path, num, method):
+    # worker opens the PDF itself and returns the raw result of the method for its page
+    with fitz.open(path) as doc:
+        page = doc.load_page(num)
+        if method == 'tables':
+            return [tab.extract() for tab in page.find_tables()]  # detect the tables
+        return page.get_text()
+
+
+def extract_pages(path, pages, method, workers=None, digest=None):
+    # Cached page results are used when present, the missing pages are extracted
+    # by a process pool, every page in its own process, and cached.
+    # The caller extracting several page sets of one PDF passes its digest.
+    if digest is None:
+        digest = pdf_digest(path)
+    result = {}
+    missing = []
+    for num in pages:
+        value = cache_read(digest, num, method)
+        if value is None:
+            missing.append(num)
+        else:
+            result[num] = value
+    if missing:
+        if workers is None:
+            workers = min(len(missing), os.cpu_count() or 1)
+        if workers > 1:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                values = list(executor.map(extract_page, [path] * len(missing), missing, [method] * len(missing)))
+        else:
+            values = [extract_page(path, num, method) for num in missing]
+        for num, value in zip(missing, values):
+            result[num] = value
+            try:
+                cache_write(digest, num, method, value)
+            except OSError:
+                pass  # read-only directory or full disk: go on without the cache
+        cache_evict()
+    return [result[num] for num in pages]
+
+
+def extract_text(path, digest=None):
+    # Text of every page: get_text() is cheap, so the pages go one after
+    # another in a single fitz.open and the result is one cache entry.
+    if digest is None:
+        digest = pdf_digest(path)
+    texts = cache_read(digest, 'all', 'text')
+    if texts is None:
         with fitz.open(path) as doc:
-            for num, page in enumerate(doc.pages()):            
-                if PINOUT_PAGE_START <= num <= PINOUT_PAGE_STOP:
-                    tabs = page.find_tables()  # detect the tables
-                    for tab in tabs:
-                        string = tab.extract()
-                        for i, s in enumerate(string):
-                            if i >= PINOUT_STRING_START:
-                                c = []
-                                for cell in s:
-                                    t = cell.replace('\n', '')
-                                    c.append(t)
-                                    # cell.strip()
-                                column = ",".join(c)
-                                column += '\n'
-                                fw.write(column)
-                                acc.append(c)
+            texts = [page.get_text() for page in doc.pages()]
+        try:
+            cache_write(digest, 'all', 'text', texts)
+        except OSError:
+            pass  # read-only directory or full disk: go on without the cache
+        cache_evict()
+    return texts
+
+
+def build_text_index(path, digest=None):
+    # one cheap get_text() sweep (cached) over the whole datasheet,
+    # every page is indexed by the keywords found on it
+    keywords = PINOUT_KEYWORDS + ALTFNC_KEYWORDS + TABLE_KEYWORDS
+    index = {}
+    for num, text in enumerate(extract_text(path, digest)):
+        text = text.lower()
+        index[num] = {keyword for keyword in keywords if keyword in text}
+    return index
+
+
+def find_stm32_pages(path, digest=None):
+    # Pinout pages have the pin definitions table title and EVENTOUT cells,
+    # alternate function pages have the mapping title and the AF15 column.
+    # The table of contents mentions the titles too, but has no table cells.
+    # Hard-coded STM32F407 pages are used if nothing is found.
+    index = build_text_index(path, digest)
+    pinout_pages = []
+    altfnc_pages = []
+    for num, keywords in sorted(index.items()):
+        if keywords.intersection(ALTFNC_KEYWORDS) and 'af15' in keywords:
+            altfnc_pages.append(num)
+        elif keywords.intersection(PINOUT_KEYWORDS) and 'eventout' in keywords:
+            pinout_pages.append(num)
+    if not pinout_pages:
+        pinout_pages = list(range(PINOUT_PAGE_START, PINOUT_PAGE_STOP + 1))
+    if not altfnc_pages:
+        altfnc_pages = list(range(ALTFNC_PAGE_START, ALTFNC_PAGE_START + 3))
+    return pinout_pages, altfnc_pages
+
+
+def pinout_header(rows):
+    # Column titles from the header rows of the table: the package titles are
+    # in the second row under "Pin number", the other titles span both rows.
+    header = []
+    for row in rows:
+        for j, cell in enumerate(row):
+            if j == len(header):
+                header.append('')
+            title = ' '.join((cell or '').split())
+            if title != '':
+                header[j] = title
+    for j, title in enumerate(header):
+        match = package_title.fullmatch(title)
+        if match:
+            header[j] = match.group(1) + '-' + match.group(2)
+    return header
+
+
+def parse_stm32_pinout(path, workers=None, pages=None, tmp_file=pinout_tmp, digest=None):
+    # The first row of the result and of the temporary file is the header of
+    # the first table, the packages and the columns differ between the STM32 series.
+    acc = []
+    acc.append([])
+    # table detection is the slowest step, so the pages are extracted in parallel
+    if pages is None:
+        pages = list(range(PINOUT_PAGE_START, PINOUT_PAGE_STOP + 1))
+    page_tables = extract_pages(path, pages, 'tables', workers, digest)
+    # merge the pages in page order, tmp_file=None skips the temporary file
+    with open(tmp_file or os.devnull, "w") as fw:
+        for tabs in page_tables:
+            for string in tabs:
+                if not acc[0]:
+                    acc[0] = pinout_header(string[:PINOUT_STRING_START])
+                    fw.write(",".join(acc[0]) + '\n')
+                for i, s in enumerate(string):
+                    if i >= PINOUT_STRING_START:
+                        c = []
+                        for cell in s:
+                            t = (cell or '').replace('\n', '')
+                            c.append(t)
+                        column = ",".join(c)
+                        column += '\n'
+                        fw.write(column)
+                        acc.append(c)
     return acc
 
-def parse_stm32_alternate_fn(path):
+def parse_stm32_alternate_fn(path, pages=None, tmp_file=altfnc_tmp, digest=None):
     # символы переноса
     wrap_symb = ('-', '_', '/')
     # ошибочное включение символа переноса в ячейках таблицы
@@ -77,103 +270,94 @@ def parse_stm32_alternate_fn(path):
                             ('TRACECL', 'K'))
     num_skip_before = 46
     num_skip_after = 0
-    with open(altfnc_tmp, "w") as fw:
-        with fitz.open(path) as doc:
-            text = []
-            for num, page in enumerate(doc):
-                # if ALTFNC_PAGE_START <= num <= ALTFNC_PAGE_STOP:
-                if ALTFNC_PAGE_START <= num <= ALTFNC_PAGE_START+2:
-                    string = page.get_text()
-                    # string = string.replace('\n', ',')
-                    # string = string.split(",")
-                    string = string.replace(' ', '')
-                    string = string.split("\n")
-                    text.append(string)                    
-
-    # remove unnecessary data
-    strings = []
-    for page in text:
-        l = len(page)
-        for i, cell in enumerate(page):
-            if num_skip_before < i < (l - 1 - num_skip_after):
-                strings.append(cell)
+    with open(tmp_file or os.devnull, "w") as fw:
+        text = []
+        if pages is None:
+            # pages = range(ALTFNC_PAGE_START, ALTFNC_PAGE_STOP + 1)
+            pages = range(ALTFNC_PAGE_START, ALTFNC_PAGE_START + 3)
+        texts = extract_text(path, digest)
+        for string in (texts[num] for num in pages):
+            # string = string.replace('\n', ',')
+            # string = string.split(",")
+            string = string.replace(' ', '')
+            string = string.split("\n")
+            text.append(string)
+
+    # Single streaming pass: every stage is a generator feeding the next one
+    # and the rows grow as needed. Exclusions are looked up in a set and wrap
+    # patterns in a dictionary keyed by the first fragment.
+    exclude = set(stm32f407_exclude)
+    wrap_pairs = {}
+    for first, second in stm32f407_wrap_wo_ws:
+        wrap_pairs.setdefault(first, set()).add(second)
+
+    cells = skip_page_margins(text, num_skip_before, num_skip_after)
+    cells = (cell.replace('/', '') if cell in exclude else cell for cell in cells)
+    strings = repair_wraps(cells, wrap_symb)
+    strings = join_wrap_patterns(strings, wrap_pairs)
+    return split_rows(strings, 'EVENTOUT')
+
+
+def skip_page_margins(pages, num_skip_before, num_skip_after):
+    # remove unnecessary data: the first page has its own top margin,
+    # the following pages have top and bottom margins
+    for page in pages:
+        yield from page[num_skip_before + 1:len(page) - 1 - num_skip_after]
         num_skip_before = 5
         num_skip_after = 42
 
-    # remove stm32f407_exclude
-    del text
-    text = []
-    for cell in strings:
-        symb_exist = False
-        for symb in stm32f407_exclude:
-            if cell == symb:
-                symb_exist = True
-            else:
-                pass
-        if symb_exist:
-            text.append(cell.replace('/', ''))
-        else:
-            text.append(cell)
 
-    # wrap repair
-    del strings
-    strings = []
+def repair_wraps(cells, wrap_symb):
+    # cells starting with a wrap symbol, following a cell ending with it, or
+    # consisting of a single character except '-' continue the previous string
+    string = None
     wrap_after = False
-    for i, cell in enumerate(text):
-        wrap_flag = 'normal'
-        lc = len(cell)
-        ic = lc -1
-        ls = len(strings)
-        if lc == 1:
-            if cell != '-':
-                strings[ls-1] += cell
-            else:
-                strings.append(cell)
+    for cell in cells:
+        if cell == '':
+            continue
+        if len(cell) == 1:
+            if cell != '-' and string is not None:
+                string += cell
+                continue
+        elif string is not None and (wrap_after or cell[0] in wrap_symb):
+            string += cell
+            wrap_after = False
+            continue
+        if string is not None:
+            yield string
+        string = cell
+        if len(cell) > 1 and cell[-1] in wrap_symb:
+            wrap_after = True
+    if string is not None:
+        yield string
+
+
+def join_wrap_patterns(strings, wrap_pairs):
+    # pin wrapped by pattern: the pairs wrapped without a wrap symbol
+    previous = None
+    for string in strings:
+        if previous is not None and string in wrap_pairs.get(previous, ()):
+            yield previous + string
+            previous = None
         else:
-            if wrap_after == True:
-                strings[ls-1] += cell
-                wrap_after = False
-            else:
-                if cell[0] == '-' or \
-                cell[0] == '_' or \
-                cell[0] == '/':
-                    strings[ls-1] += cell
-                elif cell[ic] == '-' or \
-                    cell[ic] == '_' or \
-                    cell[ic] == '/':
-                        strings.append(cell)
-                        wrap_after = True
-                else:
-                    strings.append(cell)
-
-    # pin wraped by pattern
-    del text
-    text = []
-    ll = len(strings)
-    i = 0
-    while i < ll:
-        wrap_status = 'no wrap'
-        if i < ll - 1:
-            for pat in stm32f407_wrap_wo_ws:
-                if strings[i] == pat[0] and strings[i+1] == pat[1]:
-                    text.append("".join(pat))                
-                    wrap_status = 'wrap'
-                    i += 1
-                else:
-                    pass
-        if wrap_status == 'no wrap':
-            text.append(strings[i])
-        i += 1
-
-    # split by "EVENTOUT"
-    i = 0
-    result = [[] for x in range(128)]
-    for cell in text:
-        result[i].append(cell)
-        if cell == 'EVENTOUT':
-            i += 1
-    return result[:i]
-    
+            if previous is not None:
+                yield previous
+            previous = string
+    if previous is not None:
+        yield previous
+
+
+def split_rows(strings, end):
+    # split by "EVENTOUT", cells after the last one are dropped
+    result = []
+    row = []
+    for cell in strings:
+        row.append(cell)
+        if cell == end:
+            result.append(row)
+            row = []
+    return result
+
 
 if __name__ == '__main__':
     main(file)
\ No newline at end of file
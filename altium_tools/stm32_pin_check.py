@@ -0,0 +1,116 @@
+# coding: utf-8
+# Netlist vs. datasheet pin function checker
+# The program infers the function of every MCU net from its name (MCU_SPI1_MOSI -> SPI1_MOSI)
+# and checks that the pin the net lands on has this alternate function in the datasheet
+# pin table written by parse_pdf.parse_stm32_pinout. Every mismatch is reported with the pins
+# having the function. The exit code is 1 if there are mismatches, so the check can be
+# a pre-release gate.
+# In the command line enter
+# python <Current Python File> <Netlist File> [Designator or Pattern ...] [--pinout pinout.tmp] [--no-mmap]
+
+import argparse
+import sys
+import time
+
+from colorama import Fore
+
+import parse_pdf
+from altium_netlist_parsing import DEFAULT_DESIGNATORS, gpio_pin, get_pinout, read_netlist_index, select_components
+from stm32_pin_mux import load_pins
+
+
+def index_pins(pins):
+
+    # Hash indexes of the pin table:
+    # pin_signals: port pin -> set of its functions
+    # signal_pins: function -> port pins having it
+    pin_signals = {}
+    signal_pins = {}
+    for pin, pin_name, positions, signals in pins:
+        pin_signals.setdefault(pin, set()).update(signals)
+        for signal in signals:
+            pins_of_signal = signal_pins.setdefault(signal, [])
+            if pin not in pins_of_signal:
+                pins_of_signal.append(pin)
+    return pin_signals, signal_pins
+
+
+def net_function(net, signal_pins):
+
+    # The longest run of the net name words that is a known function:
+    # MCU_SPI1_MOSI -> SPI1_MOSI, ETH_RMII_TXD0_PHY -> ETH_RMII_TXD0.
+    # Nets without a known function (LED1, NetR1_2) return None.
+    words = net.upper().split('_')
+    for length in range(len(words), 0, -1):
+        for start in range(len(words) - length + 1):
+            function = '_'.join(words[start:start + length])
+            if function in signal_pins:
+                return function
+    return None
+
+
+def check_component(pinout, pin_signals, signal_pins):
+
+    # pinout rows are [pin number, net, pin name, pin type]
+    conflicts = []
+    for pin_num, net, pin_name, pin_type in pinout:
+        function = net_function(net, signal_pins)
+        if function is None:
+            continue
+        match = gpio_pin.match(pin_name)
+        pin = match.group(0) if match else pin_name
+        if function not in pin_signals.get(pin, ()):
+            conflicts.append((pin_num, pin_name, net, function, signal_pins[function]))
+    return conflicts
+
+
+def check_netlist(netlist_file, pinout_file, patterns=DEFAULT_DESIGNATORS, use_mmap=True):
+
+    # the netlist and the pin table are read once, every pin is two dictionary lookups
+    packages, pins = load_pins(pinout_file)
+    pin_signals, signal_pins = index_pins(pins)
+    index = read_netlist_index(netlist_file, use_mmap=use_mmap)
+    results = []
+    for designator in select_components(index, patterns):
+        pinout = get_pinout(index, designator)
+        results.append((designator, len(pinout), check_component(pinout, pin_signals, signal_pins)))
+    return results
+
+
+def get_arguments():
+
+    parser = argparse.ArgumentParser(description='Check the net functions of the MCU pins against the datasheet')
+    parser.add_argument('netlist', help='WireList netlist file')
+    parser.add_argument('designators', nargs='*', default=list(DEFAULT_DESIGNATORS),
+                        help='designators or patterns of the MCUs')
+    parser.add_argument('--pinout', default=parse_pdf.pinout_tmp, help='pinout file of parse_pdf')
+    parser.add_argument('--no-mmap', dest='use_mmap', action='store_false',
+                        help='read the netlist as text instead of memory-mapping it')
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+
+    options = get_arguments()
+    start_time = time.time()
+
+    try:
+        results = check_netlist(options.netlist, options.pinout, options.designators, options.use_mmap)
+    except (OSError, ValueError) as err:
+        print(Fore.RED + str(err))
+        sys.exit(1)
+    if not results:
+        print(Fore.RED + 'No components with GPIO pins match ' + ' '.join(options.designators))
+        sys.exit(1)
+
+    num_conflicts = 0
+    for designator, num_pins, conflicts in results:
+        print(designator + ': ' + str(num_pins) + ' pins, ' + str(len(conflicts)) + ' conflict(s)')
+        for pin_num, pin_name, net, function, pins in conflicts:
+            print(Fore.RED + '    ' + pin_num + '\t' + pin_name + '\t' + net + '\t' + function
+                  + ' is not available on ' + pin_name + ', only on ' + ', '.join(pins))
+        num_conflicts += len(conflicts)
+    print('Checked in %.3f s' % (time.time() - start_time))
+
+    if num_conflicts:
+        sys.exit(1)
@@ -0,0 +1,211 @@
+# coding: utf-8
+# STM32 datasheet library indexer
+# The program walks the components tree, extracts pinout and alternate function tables
+# of every STM32 datasheet in parallel and stores them in SQLite database indexed by part,
+# package, pin name and alternate function. Datasheets already indexed with the same
+# content are skipped.
+# In the command line enter
+# python <Current Python File> index [<Components Directory>] [--db <Database File>]
+# python <Current Python File> query [--part STM32F4] [--package LQFP-100] [--pin PA7] [--function ETH_RMII]
+
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+import os
+import re
+import sqlite3
+import sys
+
+import parse_pdf
+from stm32_pinout import pinout_columns, port_pin, split_functions
+
+COMPONENTS_DIR = '..//..//..//components'
+DATABASE_FILE = 'altium_tools//stm32_pins.db'
+# version of the stored data (PRAGMA user_version), the datasheets of an older one are indexed again
+INDEX_VERSION = 2
+
+part_name = re.compile(r'STM32\w+', re.I)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS parts (id INTEGER PRIMARY KEY, part TEXT, path TEXT UNIQUE, digest TEXT);
+CREATE TABLE IF NOT EXISTS pins (id INTEGER PRIMARY KEY, part_id INTEGER, pin TEXT, pin_name TEXT, pin_type TEXT);
+CREATE TABLE IF NOT EXISTS packages (pin_id INTEGER, package TEXT, position TEXT);
+CREATE TABLE IF NOT EXISTS functions (pin_id INTEGER, function TEXT, source TEXT);
+CREATE INDEX IF NOT EXISTS parts_part ON parts (part);
+CREATE INDEX IF NOT EXISTS pins_part ON pins (part_id);
+CREATE INDEX IF NOT EXISTS pins_pin ON pins (pin);
+CREATE INDEX IF NOT EXISTS packages_pin ON packages (pin_id);
+CREATE INDEX IF NOT EXISTS packages_package ON packages (package, pin_id);
+CREATE INDEX IF NOT EXISTS functions_pin ON functions (pin_id);
+CREATE INDEX IF NOT EXISTS functions_function ON functions (function, pin_id);
+"""
+
+
+def find_datasheets(components_dir):
+    datasheets = []
+    for root, dirs, files in os.walk(components_dir):
+        for name in files:
+            if name.lower().endswith('.pdf') and part_name.search(name):
+                datasheets.append(os.path.join(root, name))
+    datasheets.sort()
+    return datasheets
+
+
+def extract_datasheet(path, digest):
+
+    # Worker: pinout and alternate function tables of one datasheet. The
+    # process pool is already busy with datasheets, so the pages go one by one.
+    try:
+        pinout_pages, altfnc_pages = parse_pdf.find_stm32_pages(path, digest=digest)
+        pinout = parse_pdf.parse_stm32_pinout(path, workers=1, pages=pinout_pages, tmp_file=None, digest=digest)
+        pinout_columns(pinout[0])
+        altfnc = parse_pdf.parse_stm32_alternate_fn(path, pages=altfnc_pages, tmp_file=None, digest=digest)
+    except Exception as err:  # a broken PDF must not stop the whole library
+        return path, None, None, None, str(err)
+    return path, digest, pinout, altfnc, ''
+
+
+def store_datasheet(db, path, digest, pinout, altfnc):
+
+    db.execute('DELETE FROM functions WHERE pin_id IN '
+               '(SELECT pins.id FROM pins JOIN parts ON pins.part_id = parts.id WHERE parts.path = ?)', (path,))
+    db.execute('DELETE FROM packages WHERE pin_id IN '
+               '(SELECT pins.id FROM pins JOIN parts ON pins.part_id = parts.id WHERE parts.path = ?)', (path,))
+    db.execute('DELETE FROM pins WHERE part_id IN (SELECT id FROM parts WHERE path = ?)', (path,))
+    db.execute('DELETE FROM parts WHERE path = ?', (path,))
+
+    match = part_name.search(os.path.basename(path))
+    part = match.group(0).upper()
+    part_id = db.execute('INSERT INTO parts (part, path, digest) VALUES (?, ?, ?)', (part, path, digest)).lastrowid
+
+    packages, pin_name_column, pin_type_column, altfnc_column = pinout_columns(pinout[0])
+    pin_ids = {}
+    for row in pinout[1:]:
+        if len(row) <= altfnc_column:
+            continue
+        pin_name = row[pin_name_column]
+        match = port_pin.match(pin_name)
+        pin = match.group(0) if match else pin_name
+        pin_id = db.execute('INSERT INTO pins (part_id, pin, pin_name, pin_type) VALUES (?, ?, ?, ?)',
+                            (part_id, pin, pin_name, row[pin_type_column])).lastrowid
+        pin_ids.setdefault(pin, pin_id)
+        db.executemany('INSERT INTO packages (pin_id, package, position) VALUES (?, ?, ?)',
+                       [(pin_id, package, row[i]) for i, package in packages if row[i] not in ('', '-')])
+        # the alternate functions cell and the additional functions (ADC, RTC, oscillator) after it
+        functions = []
+        for cell in row[altfnc_column:]:
+            for function in split_functions(cell):
+                if function not in functions:
+                    functions.append(function)
+        db.executemany('INSERT INTO functions (pin_id, function, source) VALUES (?, ?, ?)',
+                       [(pin_id, function, 'pinout') for function in functions])
+
+    # alternate function rows start with the port pin name
+    for row in altfnc:
+        pin = None
+        for i, cell in enumerate(row):
+            match = port_pin.fullmatch(cell)
+            if match:
+                pin = cell
+                break
+        pin_id = pin_ids.get(pin)
+        if pin_id is None:
+            continue
+        functions = []
+        for cell in row[i + 1:]:
+            functions.extend(split_functions(cell))
+        db.executemany('INSERT INTO functions (pin_id, function, source) VALUES (?, ?, ?)',
+                       [(pin_id, function, 'altfnc') for function in functions])
+
+
+def index_library(components_dir, database_file, workers=None):
+
+    db = sqlite3.connect(database_file)
+    db.executescript(SCHEMA)
+    indexed = dict(db.execute('SELECT path, digest FROM parts'))
+    if db.execute('PRAGMA user_version').fetchone()[0] < INDEX_VERSION:
+        indexed = {}
+
+    # every PDF is read once for its digest, the workers get it with the path
+    datasheets = []
+    digests = []
+    for path in find_datasheets(components_dir):
+        digest = parse_pdf.pdf_digest(path)
+        if indexed.get(path) != digest:
+            datasheets.append(path)
+            digests.append(digest)
+    print(str(len(datasheets)) + ' datasheet(s) to index')
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for path, digest, pinout, altfnc, error in executor.map(extract_datasheet, datasheets, digests):
+            if error:
+                print(path + ': ERROR: ' + error)
+                continue
+            with db:
+                store_datasheet(db, path, digest, pinout, altfnc)
+            print(path + ': ' + str(len(pinout) - 1) + ' pins')
+    db.execute('PRAGMA user_version = %d' % INDEX_VERSION)
+    db.close()
+
+
+def glob_pattern(value):
+    # prefix match unless the value has its own wildcards
+    if any(c in value for c in '*?['):
+        return value
+    return value + '*'
+
+
+def query_pins(database_file, part=None, package=None, pin=None, function=None):
+
+    sql = ('SELECT DISTINCT parts.part, packages.package, packages.position, pins.pin_name, functions.function '
+           'FROM pins JOIN parts ON pins.part_id = parts.id '
+           'JOIN packages ON packages.pin_id = pins.id '
+           'JOIN functions ON functions.pin_id = pins.id')
+    conditions = []
+    args = []
+    if part:
+        conditions.append('parts.part GLOB ?')
+        args.append(glob_pattern(part.upper()))
+    if package:
+        conditions.append('packages.package = ?')
+        args.append(package)
+    if pin:
+        conditions.append('pins.pin = ?')
+        args.append(pin.upper())
+    if function:
+        conditions.append('functions.function GLOB ?')
+        args.append(glob_pattern(function.upper()))
+    if conditions:
+        sql += ' WHERE ' + ' AND '.join(conditions)
+    sql += ' ORDER BY parts.part, packages.package, pins.pin_name, functions.function'
+
+    with sqlite3.connect(database_file) as db:
+        return db.execute(sql, args).fetchall()
+
+
+def get_arguments():
+
+    parser = argparse.ArgumentParser(description='STM32 datasheet pin database')
+    parser.add_argument('--db', default=DATABASE_FILE, help='SQLite database file')
+    commands = parser.add_subparsers(dest='command', required=True)
+    index = commands.add_parser('index', help='index datasheets of the components tree')
+    index.add_argument('components_dir', nargs='?', default=COMPONENTS_DIR)
+    query = commands.add_parser('query', help='find pins by part, package, pin name and alternate function')
+    query.add_argument('--part', help='part name or its prefix, e.g. STM32F4')
+    query.add_argument('--package', help='package, e.g. LQFP-100')
+    query.add_argument('--pin', help='port pin, e.g. PA7')
+    query.add_argument('--function', help='alternate function or its prefix, e.g. ETH_RMII')
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+
+    options = get_arguments()
+
+    if options.command == 'index':
+        if not os.path.isdir(options.components_dir):
+            print('Components directory ' + options.components_dir + ' does not exist')
+            sys.exit(1)
+        index_library(options.components_dir, options.db)
+    else:
+        for row in query_pins(options.db, options.part, options.package, options.pin, options.function):
+            print('\t'.join(row))
@@ -0,0 +1,236 @@
+# coding: utf-8
+# STM32 pin multiplexing solver
+# The program takes the peripheral signals the design needs and finds the pins of the
+# package to route them to, so that no pin carries two signals, or proves that there is
+# no such assignment and shows the signals competing for too few pins.
+# A requirement is a signal (SPI1_SCK), a peripheral with all its signals (SPI1, USART3,
+# ETH_RMII) or a short list of signals of one peripheral (TIM9_CH1/CH2).
+# The pin table is the pinout file written by parse_pdf.parse_stm32_pinout.
+# In the command line enter
+# python <Current Python File> --package LQFP-100 [--pinout pinout.tmp] [--reserve PA13 PA14] SPI1 USART3 ETH_RMII TIM9_CH1/CH2
+
+import argparse
+import sys
+import time
+
+import parse_pdf
+from stm32_pinout import normalize_signal, pinout_columns, port_pin, read_pinout, split_functions
+
+
+def load_pins(pinout_file):
+
+    # Package names of the pin table and its rows as (pin, pin name,
+    # {package: position}, [signals]). The columns are found by the header
+    # of the file. The alternate functions cell is '/' separated, additional
+    # functions (ADC inputs, RTC, oscillator) follow in the next cells.
+    header, rows = read_pinout(pinout_file)
+    packages, pin_name_column, pin_type_column, altfnc_column = pinout_columns(header)
+    pins = []
+    for row in rows:
+        if len(row) <= altfnc_column:
+            continue
+        pin_name = row[pin_name_column]
+        match = port_pin.match(pin_name)
+        if not match:
+            continue  # power and control pins have no alternate functions
+        positions = {}
+        for i, package in packages:
+            if row[i] not in ('', '-'):
+                positions[package] = row[i]
+        signals = []
+        for cell in row[altfnc_column:]:
+            for signal in split_functions(cell):
+                if signal not in signals:
+                    signals.append(signal)
+        pins.append((match.group(0), pin_name, positions, signals))
+    return [package for i, package in packages], pins
+
+
+def expand_requirements(requirements, signals):
+
+    # Returns the required signals in the order of the requirements and
+    # the requirements not available on the package.
+    required = []
+    missing = []
+    for requirement in requirements:
+        # TIM9_CH1/CH2 -> TIM9_CH1, TIM9_CH2
+        parts = normalize_signal(requirement).split('/')
+        prefix = parts[0].rpartition('_')[0]
+        names = [parts[0]] + [part if '_' in part or not prefix else prefix + '_' + part for part in parts[1:]]
+        for name in names:
+            if name in signals:
+                found = [name]
+            else:
+                # SPI1 -> SPI1_*, FSMC_D -> FSMC_D0, FSMC_D1, ... but not TIM1 -> TIM10
+                found = sorted(signal for signal in signals if signal.startswith(name) and len(signal) > len(name)
+                               and (signal[len(name)] == '_' or name[-1].isalpha() and signal[len(name)].isdigit()))
+            if not found:
+                missing.append(name)
+            for signal in found:
+                if signal not in required:
+                    required.append(signal)
+    return required, missing
+
+
+def build_candidates(pins, package, reserved=()):
+
+    # Pins of the package are numbered in the pin table order, the candidates
+    # of every signal are the bits of an int, so the set operations of the
+    # search are single integer operations.
+    package_pins = []
+    candidates = {}
+    for pin, pin_name, positions, signals in pins:
+        if package not in positions or pin in reserved:
+            continue
+        bit = 1 << len(package_pins)
+        package_pins.append((pin, positions[package]))
+        for signal in signals:
+            candidates[signal] = candidates.get(signal, 0) | bit
+    return package_pins, candidates
+
+
+def popcount(mask):
+    return bin(mask).count('1')
+
+
+def iterate_bits(mask):
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+
+def augment(signal, domains, owner, taken, seen):
+
+    # Kuhn's augmenting path: gives the signal a pin, moving the owners of
+    # the pins to their other candidates when needed.
+    free = domains[signal] & ~taken
+    if free:
+        pin = (free & -free).bit_length() - 1
+        owner[pin] = signal
+        return True
+    for pin in iterate_bits(domains[signal] & ~seen[0]):
+        seen[0] |= 1 << pin
+        if augment(owner[pin], domains, owner, taken, seen):
+            owner[pin] = signal
+            return True
+    return False
+
+
+def match_signals(domains, owner=None, signals=None):
+
+    # Completes the matching pin -> signal for the signals, returns the first
+    # signal left without a pin or None.
+    if owner is None:
+        owner = {}
+    if signals is None:
+        signals = sorted(domains, key=lambda signal: popcount(domains[signal]))
+    for signal in signals:
+        taken = 0
+        for pin in owner:
+            taken |= 1 << pin
+        if not augment(signal, domains, owner, taken, [0]):
+            return signal
+    return None
+
+
+def hall_conflict(signal, domains, owner):
+
+    # Signals reachable from the unmatched one by alternating paths compete
+    # for fewer pins than they are (Hall's theorem), which proves that no
+    # assignment exists.
+    signals = [signal]
+    pins = 0
+    i = 0
+    while i < len(signals):
+        new_pins = domains[signals[i]] & ~pins
+        pins |= new_pins
+        for pin in iterate_bits(new_pins):
+            if owner.get(pin) is not None and owner[pin] not in signals:
+                signals.append(owner[pin])
+        i += 1
+    return signals, pins
+
+
+def solve_pin_mux(candidates, required):
+
+    # Search over bitset domains: the most constrained signal (fewest
+    # candidate pins) is assigned first, its pins are tried from the one
+    # wanted by fewest other signals, so the multi-purpose pins stay free.
+    # A choice is propagated by removing the pin from the other domains and
+    # kept only if the matching of the remaining signals can be repaired by
+    # one augmenting path: a dead end is cut off at once and the search never
+    # has to go back on an earlier choice. Returns ({signal: pin index}, None)
+    # or (None, (conflicting signals, pins mask)).
+    domains = {signal: candidates.get(signal, 0) for signal in required}
+    owner = {}
+    unmatched = match_signals(domains, owner)
+    if unmatched is not None:
+        return None, hall_conflict(unmatched, domains, owner)
+
+    assignment = {}
+    while domains:
+        signal = min(domains, key=lambda s: (popcount(domains[s]), required.index(s)))
+        demand = {}
+        for other, domain in domains.items():
+            if other != signal:
+                for pin in iterate_bits(domain):
+                    demand[pin] = demand.get(pin, 0) + 1
+        # the pin matched to the signal is always feasible, so one of the pins is taken
+        for pin in sorted(iterate_bits(domains[signal]), key=lambda pin: (demand.get(pin, 0), pin)):
+            bit = 1 << pin
+            new_domains = {other: domain & ~bit for other, domain in domains.items() if other != signal}
+            new_owner = {p: other for p, other in owner.items() if other != signal and p != pin}
+            displaced = owner.get(pin)
+            if displaced is None or displaced == signal or \
+                    match_signals(new_domains, new_owner, [displaced]) is None:
+                break
+        assignment[signal] = pin
+        domains = new_domains
+        owner = new_owner
+    return assignment, None
+
+
+def get_arguments():
+
+    parser = argparse.ArgumentParser(description='STM32 pin multiplexing solver')
+    parser.add_argument('requirements', nargs='+',
+                        help='signals or peripherals: SPI1 USART3_TX ETH_RMII TIM9_CH1/CH2')
+    parser.add_argument('--package', required=True, help='package column of the pin table, e.g. LQFP-100')
+    parser.add_argument('--pinout', default=parse_pdf.pinout_tmp, help='pinout file of parse_pdf')
+    parser.add_argument('--reserve', nargs='+', default=[], help='pins not to be used, e.g. PA13 PA14')
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+
+    options = get_arguments()
+    start_time = time.time()
+
+    try:
+        packages, pins = load_pins(options.pinout)
+    except (OSError, ValueError) as err:
+        print(err)
+        sys.exit(1)
+    if options.package not in packages:
+        print('No ' + options.package + ' package in ' + options.pinout + ', choose from ' + ', '.join(packages))
+        sys.exit(1)
+    package_pins, candidates = build_candidates(pins, options.package, {pin.upper() for pin in options.reserve})
+    required, missing = expand_requirements(options.requirements, candidates)
+    if missing:
+        print('Not available on ' + options.package + ': ' + ', '.join(missing))
+        sys.exit(1)
+
+    assignment, conflict = solve_pin_mux(candidates, required)
+    if assignment is None:
+        signals, mask = conflict
+        print('No conflict-free assignment: ' + str(len(signals)) + ' signal(s) compete for '
+              + str(popcount(mask)) + ' pin(s)')
+        print('    ' + ', '.join(sorted(signals)))
+        print('    ' + ', '.join(package_pins[pin][0] for pin in iterate_bits(mask)))
+        sys.exit(1)
+
+    for signal in required:
+        pin, position = package_pins[assignment[signal]]
+        print(signal + '\t' + pin + '\t' + position)
+    print('%d signal(s) assigned in %.3f s' % (len(required), time.time() - start_time))
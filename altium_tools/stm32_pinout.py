@@ -0,0 +1,69 @@
+# coding: utf-8
+# STM32 datasheet pin table format shared by the PDF parser, the pin database,
+# the pin multiplexing solver and the netlist checker.
+# The pinout file written by parse_pdf.parse_stm32_pinout is comma separated, its first
+# line is the table header: the package columns ("LQFP-100") go first, the pin name,
+# pin type and alternate functions columns are found by their titles.
+
+import re
+
+# "OSC32_IN(4)" -> "OSC32_IN"
+footnote = re.compile(r'(?:\(\d+\))+$')
+
+# package title of the pinout table header: "LQFP64", "UFBGA 176(1)" -> "LQFP-64", "UFBGA-176"
+package_title = re.compile(r'([A-Z]+)\s*-?\s*(\d+)(?:\s*\(\d+\))*')
+
+port_pin = re.compile(r'P[A-K]\d+')
+
+
+def normalize_signal(function):
+    # the datasheet tables break the names with spaces: "ETH _MII_TXD0"
+    return footnote.sub('', function.replace(' ', '').upper())
+
+
+def split_functions(cell):
+    # "TRACECLK/ FSMC_A23 /ETH _MII_TXD3 /EVENTOUT" -> ['TRACECLK', 'FSMC_A23', 'ETH_MII_TXD3', 'EVENTOUT']
+    functions = []
+    for function in cell.split('/'):
+        function = normalize_signal(function.strip())
+        if function not in ('', '-') and function not in functions:
+            functions.append(function)
+    return functions
+
+
+def pinout_columns(header):
+
+    # Package columns and positions of the pin name, pin type and alternate
+    # functions columns from the pinout table header: the package columns go
+    # first and every title must be recognized, a table of another layout is
+    # rejected instead of taking its positions for wrong packages.
+    packages = []
+    for i, title in enumerate(header):
+        if not package_title.fullmatch(title):
+            break
+        packages.append((i, title))
+    titles = [title.lower() for title in header]
+    columns = []
+    for prefix in ('pin name', 'pin type', 'alternate function'):
+        found = [i for i, title in enumerate(titles) if title.startswith(prefix)]
+        if not found:
+            break
+        columns.append(found[0])
+    if not packages or len(columns) != 3:
+        raise ValueError('pinout table header is not recognized: ' + ', '.join(header))
+    return packages, columns[0], columns[1], columns[2]
+
+
+def read_pinout(pinout_file):
+
+    # Returns the header and the rows of the pinout file, ValueError if the
+    # first line is not a pinout table header (file of an older parse_pdf).
+    with open(pinout_file, 'r', errors='replace') as input_file:
+        rows = [line.rstrip('\r\n').split(',') for line in input_file]
+    if not rows:
+        raise ValueError(pinout_file + ': empty pinout file')
+    try:
+        pinout_columns(rows[0])
+    except ValueError as err:
+        raise ValueError(pinout_file + ': ' + str(err) + ', run parse_pdf again') from None
+    return rows[0], rows[1:]
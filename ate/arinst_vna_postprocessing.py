@@ -3,11 +3,13 @@
 # In the command line enter
 # python <Current Python File> <DUT1.s2p> <DUT2.s2p> ... <DUTn.s2p> Sxx
 
-import csv
 import sys
 import matplotlib.pyplot as plt
 from matplotlib.ticker import (MultipleLocator, FixedLocator, FormatStrFormatter, AutoMinorLocator)
 
+import touchstone_reader
+from decimated_plot import plot_decimated
+
 # Set Figure Size
 PLOT_SIZE_X = 12
 PLOT_SIZE_Y = 9
@@ -30,9 +32,6 @@ PLOT_1_Y_MAX = 180
 PLOT_1_Y_MINOR_STEP = 30
 PLOT_1_Y_MAJOR_STEP = 60
 
-# Number of lines of the Touchstone file to skip
-NUM_SKIP_LINES = 6
-
 
 def main():
     trc = []
@@ -40,31 +39,22 @@ def main():
     for i in range(num_duts):
         input_file_name = sys.argv[i + 1]
         print(input_file_name)
-        trc.append(read_touchstone(input_file_name, NUM_SKIP_LINES))
+        trc.append(read_touchstone(input_file_name))
     delta = phase_delta(trc[0][2], trc[1][2])
     spar_plot(trc[0][0], trc[0][1], trc[1][1], delta)
     
 
-def read_touchstone(file, num_skip_lines):
-    import numpy as np
-    freq = []
-    cpl = []
-    mag = []
-    ang = []
-
-    with open(file, 'r', newline='') as data_file:
-        reader = csv.reader(data_file, delimiter='\t')
-        # skip the header
-        for i in range(num_skip_lines):
-            next(reader, None)    
-        for f, re, im in reader:
-            freq.append(int(f))
-            cpl.append(complex((float(re)), (float(im))))
-    mag = np.abs(cpl)
-    sp = 20 * np.log10(mag)
-    ang = np.angle(cpl, deg=True)
+def read_touchstone(file):
+    touchstone = touchstone_reader.load_touchstone(file)
+    # Arinst writes the measured transmission as the only pair of the line
+    if touchstone.num_ports == 1:
+        cpl = touchstone.data[:, 0, 0]
+    else:
+        cpl = touchstone.data[:, 1, 0]
+    sp = touchstone_reader.magnitude_db(cpl)
+    ang = touchstone_reader.phase_deg(cpl)
 
-    return freq, sp, ang
+    return touchstone.frequency, sp, ang
 
 
 def phase_delta(ang0, ang1):
@@ -92,8 +82,8 @@ def spar_plot(freq, s21db, s31db, phase_delta):
     ax0.tick_params(which='major', length=0, width=0.5, labelsize='large')
     ax0.tick_params(which='minor', length=0, width=0.5)
 
-    ax0.plot(freq, s21db, label="S21[dB]", color='#00008B', linewidth=2, alpha=0.75)  # RGB Color Deep Blue-Violet
-    ax0.plot(freq, s31db, label="S31[dB]", color='#99004C', linewidth=2, alpha=0.75)  # RGB Color Deep Blue-Violet
+    plot_decimated(ax0, freq, s21db, label="S21[dB]", color='#00008B', linewidth=2, alpha=0.75)  # RGB Color Deep Blue-Violet
+    plot_decimated(ax0, freq, s31db, label="S31[dB]", color='#99004C', linewidth=2, alpha=0.75)  # RGB Color Deep Blue-Violet
     ax0.legend(loc='upper right', fontsize=14)
     ax0.set_xlim(PLOT_0_X_MIN, PLOT_0_X_MAX)
     ax0.set_ylim(PLOT_0_Y_MIN, PLOT_0_Y_MAX)
@@ -112,7 +102,7 @@ def spar_plot(freq, s21db, s31db, phase_delta):
     ax1.tick_params(which='major', length=0, width=0.5, labelsize='large')
     ax1.tick_params(which='minor', length=0, width=0.5)
 
-    ax1.plot(freq, phase_delta, label="Phase[deg]", color='#00008B', linewidth=2, alpha=0.75)  # RGB Color Deep Blue-Violet
+    plot_decimated(ax1, freq, phase_delta, label="Phase[deg]", color='#00008B', linewidth=2, alpha=0.75)  # RGB Color Deep Blue-Violet
     ax1.legend(loc='upper right', fontsize=14)
     ax1.set_xlim(PLOT_0_X_MIN, PLOT_0_X_MAX)
     ax1.set_ylim(PLOT_1_Y_MIN, PLOT_1_Y_MAX)
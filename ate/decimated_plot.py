@@ -0,0 +1,133 @@
+# coding: utf-8
+# Plotting of dense sweeps shared by the viewers.
+# A trace is cut into buckets, one per horizontal pixel of the axes, and only the minimum
+# and the maximum of every bucket are drawn, so narrow notches and spikes stay visible.
+# The buckets are recomputed at drawing time from the visible x range and the axes width
+# in pixels, so zooming, resizing and saving at a higher dpi get the full detail again.
+# The traces must go in ascending x order (sweeps do), the others are drawn as they are.
+
+from matplotlib.collections import LineCollection
+from matplotlib.lines import Line2D
+import numpy as np
+
+# buckets of the first drawing, before the axes size is known
+DEFAULT_BUCKETS = 2000
+
+
+def minmax_indices(x, y, x_min, x_max, num_buckets):
+
+    # Indexes of the points to draw: the first and the last visible ones,
+    # the minimum and the maximum of every bucket in x order, and one point
+    # on each side of the visible range so the line reaches the edges.
+    start = max(int(np.searchsorted(x, x_min, 'left')) - 1, 0)
+    stop = min(int(np.searchsorted(x, x_max, 'right')) + 1, len(x))
+    num_points = stop - start
+    if num_points <= 2 * num_buckets:
+        return np.arange(start, stop)
+
+    size = -(-num_points // num_buckets)
+    full = num_points // size * size
+    blocks = y[start:start + full].reshape(-1, size)
+    lowest = blocks.argmin(axis=1)
+    highest = blocks.argmax(axis=1)
+    base = np.arange(start, start + full, size)
+    indices = [np.column_stack((base + np.minimum(lowest, highest), base + np.maximum(lowest, highest))).ravel()]
+    if full < num_points:
+        tail = y[start + full:stop]
+        indices.append(start + full + np.sort([tail.argmin(), tail.argmax()]))
+    return np.unique(np.concatenate([[start]] + indices + [[stop - 1]]))
+
+
+def is_ascending(x):
+    return len(x) < 2 or bool(np.all(x[1:] >= x[:-1]))
+
+
+def view_of(axes):
+
+    # visible x range and the axes width in pixels at the current dpi
+    x_min, x_max = sorted(axes.get_xlim())
+    return x_min, x_max, max(int(axes.bbox.width), 1)
+
+
+class DecimatedLine(Line2D):
+
+    def __init__(self, x, y, **kwargs):
+        self.full_x = np.asarray(x, dtype=float)
+        self.full_y = np.asarray(y, dtype=float)
+        self.ascending = is_ascending(self.full_x)
+        self.view = None
+        # the extremes are kept, so the data limits are those of the full trace
+        if self.ascending:
+            indices = minmax_indices(self.full_x, self.full_y, -np.inf, np.inf, DEFAULT_BUCKETS)
+            super().__init__(self.full_x[indices], self.full_y[indices], **kwargs)
+        else:
+            super().__init__(self.full_x, self.full_y, **kwargs)
+
+    def draw(self, renderer):
+        if self.ascending and self.axes is not None:
+            view = view_of(self.axes)
+            # the data is set again only when the view changes, otherwise
+            # the figure would be redrawn over and over
+            if view != self.view:
+                self.view = view
+                indices = minmax_indices(self.full_x, self.full_y, *view)
+                self.set_data(self.full_x[indices], self.full_y[indices])
+        super().draw(renderer)
+
+
+class DecimatedLineCollection(LineCollection):
+
+    def __init__(self, traces, **kwargs):
+        self.traces = []
+        for x, y in traces:
+            x = np.asarray(x, dtype=float)
+            self.traces.append((x, np.asarray(y, dtype=float), is_ascending(x)))
+        self.view = None
+        super().__init__(self.decimate(-np.inf, np.inf, DEFAULT_BUCKETS), **kwargs)
+
+    def decimate(self, x_min, x_max, num_buckets):
+        segments = []
+        for x, y, ascending in self.traces:
+            if ascending:
+                indices = minmax_indices(x, y, x_min, x_max, num_buckets)
+                segments.append(np.column_stack((x[indices], y[indices])))
+            else:
+                segments.append(np.column_stack((x, y)))
+        return segments
+
+    def draw(self, renderer):
+        if self.axes is not None:
+            view = view_of(self.axes)
+            if view != self.view:
+                self.view = view
+                self.set_segments(self.decimate(*view))
+        super().draw(renderer)
+
+
+def plot_decimated(ax, x, y, **kwargs):
+    """ Draws the trace like ax.plot(x, y, **kwargs) with min/max decimation.
+
+    Returns:
+        DecimatedLine added to the axes
+    """
+    line = DecimatedLine(x, y, **kwargs)
+    ax.add_line(line)
+    ax.autoscale_view()
+    return line
+
+
+def plot_decimated_collection(ax, traces, **kwargs):
+    """ Draws many traces as one decimated LineCollection.
+
+    Args:
+        ax: axes
+        traces: list of (x, y) pairs
+        kwargs: LineCollection properties, e.g. colors (one per trace), linewidths, alpha
+
+    Returns:
+        DecimatedLineCollection added to the axes
+    """
+    collection = DecimatedLineCollection(traces, **kwargs)
+    ax.add_collection(collection, autolim=True)
+    ax.autoscale_view()
+    return collection
@@ -1,20 +1,22 @@
 # Place S-parameters files (.s2p) to same folder
 # as s_parameters_viewer_multiple_dut.py.
 # In the command line enter
-# python <Current Python File> <DUT1.s2p> <DUT2.s2p> ... <DUTn.s2p> Sxx
+# python <Current Python File> <DUT1.s2p> <DUT2.s2p> ... <DUTn.s2p> Sxx [--lot]
+# With --lot a production lot is drawn as its statistics: mean, +/-3 sigma, min/max and
+# percentile envelopes, the DUTs out of the +/-3 sigma envelope are highlighted.
 
-import csv
+from concurrent.futures import ProcessPoolExecutor
 import matplotlib.pyplot as plt
 from matplotlib.ticker import (MultipleLocator)
+import numpy as np
 import os.path
 import sys
 
+from decimated_plot import plot_decimated, plot_decimated_collection
+from touchstone_reader import cache_touchstone, get_parameter, load_touchstone, magnitude_db
+
 # To-Do list
-# 1. read and decode Touchstone preamble
-# for frequency units, and number of model ports
-# 2. for *.s1p plot 2 traces only
-# 3. make able to read plot limits from command line sys.args 
-# 4. make able to read command line sys.args for s-parameters to plot
+# 1. make able to read plot limits from command line sys.args
 
 # Settings
 NUM_SAMPLES = 256
@@ -36,71 +38,59 @@ PLOT_0_Y_MAX = 0
 PLOT_0_Y_MINOR_STEP = 5
 PLOT_0_Y_MAJOR_STEP = 10
 
-# Number of lines of the Touchstone file to skip
-NUM_SKIP_LINES = 5
-
-# Variables statement
-num_duts = 0
-x = []
-fig, (ax0) = plt.subplots(1, 1,
-                          figsize=(PLOT_SIZE_X, PLOT_SIZE_Y),
-                          constrained_layout=True)
-
-frequency = []
-s11_db = []
-s11_ang = []
-s21_db = []
-s21_ang = []
-s12_db = []
-s12_ang = []
-s22_db = []
-s22_ang = []
-
-
-def read_touchstone(input_file_name):
-
-    # open reference data file for reading
-    input_file = open(input_file_name, 'r', newline='')
-    reader = csv.reader(input_file, delimiter=' ')
-
-    # skip the header
-    for i in range(NUM_SKIP_LINES):
-        next(reader, None)
-
-    # S-parameters data acquisition
-    for frequency_,\
-        s11_db_, s11_ang_, \
-        s21_db_, s21_ang_, \
-        s12_db_, s12_ang_, \
-        s22_db_, s22_ang_, \
-            in reader:
-        frequency.append(int((float(frequency_)/10**6)))
-        s11_db.append(float(s11_db_))
-        s11_ang.append(float(s11_ang_))
-        s21_db.append(float(s21_db_))
-        s21_ang.append(float(s21_ang_))
-        s12_db.append(float(s12_db_))
-        s12_ang.append(float(s12_ang_))
-        s22_db.append(float(s22_db_))
-        s22_ang.append(float(s22_ang_))
-
-    # close csv-file
-    input_file.close()
-
-
-def clear_variables():
-    frequency.clear()
-    s11_db.clear()
-    s11_ang.clear()
-    s21_db.clear()
-    s21_ang.clear()
-    s12_db.clear()
-    s12_ang.clear()
-    s22_db.clear()
-    s22_ang.clear()
-
-
-def plot_data(num_duts):
+# Trace colors of a few DUTs, a lot gets colors spread over the colormap
+TRACE_COLORS = ('#0000CC', '#C00000', '#00805C', '#DAA520', '#99004C', '#00008B')
+TRACE_COLORMAP = 'turbo'
+
+# The legend is drawn for a few DUTs only
+LEGEND_MAX_DUTS = 10
+
+# Lot statistics: percentile envelope, a DUT is an outlier if more than OUTLIER_FRACTION
+# of its points are out of mean +/- OUTLIER_SIGMAS * sigma, the worst ones are drawn
+LOT_PERCENTILES = (5, 95)
+OUTLIER_SIGMAS = 3
+OUTLIER_FRACTION = 0.01
+OUTLIER_MAX_PLOT = 10
+
+# Fewer DUT files are read without a process pool, every worker started on Windows
+# imports pyplot again
+POOL_MIN_FILES = 8
+
+
+def load_duts(file_names, workers=None):
+
+    # The DUTs without a valid cache are parsed in parallel processes, which
+    # write their caches, then every DUT is memory-mapped into its own arrays.
+    # Every worker gets about 4 chunks of the files, so all of them are busy
+    # and the chunks still balance the load.
+    if len(file_names) < POOL_MIN_FILES:
+        return [load_touchstone(file_name) for file_name in file_names]
+    if workers is None:
+        workers = min(len(file_names), os.cpu_count() or 1)
+    chunksize = max(1, len(file_names) // (4 * workers))
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        duts = list(executor.map(cache_touchstone, file_names, chunksize=chunksize))
+    return [load_touchstone(file_name) if touchstone is None else touchstone
+            for file_name, touchstone in zip(file_names, duts)]
+
+
+def trace_colors(num_duts):
+    if num_duts <= len(TRACE_COLORS):
+        return TRACE_COLORS[:num_duts]
+    colormap = plt.get_cmap(TRACE_COLORMAP)
+    return [colormap(i / (num_duts - 1)) for i in range(num_duts)]
+
+
+def trace_label(file_name, parameter):
+    # DUT file name without extension: "DUT17.s2p" -> "DUT17 S21"
+    return os.path.splitext(os.path.basename(file_name))[0] + ' ' + parameter
+
+
+def make_axes():
+
+    fig, (ax0) = plt.subplots(1, 1,
+                              figsize=(PLOT_SIZE_X, PLOT_SIZE_Y),
+                              constrained_layout=True)
 
     # Plot FFT Spectrum
     ax0.clear()
@@ -114,48 +104,128 @@ def plot_data(num_duts):
     ax0.yaxis.set_major_locator(MultipleLocator(PLOT_0_Y_MAJOR_STEP))
     ax0.tick_params(which='major', length=10, width=2)
     ax0.tick_params(which='minor', length=5, width=1)
+    return ax0
 
-    for i in range(num_duts):
 
-        input_file_name = sys.argv[i + 1]
+def plot_data(file_names, duts, parameter):
 
-        read_touchstone(input_file_name)
+    ax0 = make_axes()
 
-        trace_color = ('#0000CC', '#C00000', '#00805C', '#DAA520', '#99004C', '#00008B')
+    if len(duts) <= LEGEND_MAX_DUTS:
+        for file_name, touchstone, color in zip(file_names, duts, trace_colors(len(duts))):
+            plot_decimated(ax0, touchstone.frequency / 10 ** 6, magnitude_db(get_parameter(touchstone, parameter)),
+                           label=trace_label(file_name, parameter), color=color, linewidth=2, alpha=0.75)
+        ax0.legend(loc='upper right', fontsize=14)
+    else:
+        # a lot goes as one collection without legend
+        traces = [(touchstone.frequency / 10 ** 6, magnitude_db(get_parameter(touchstone, parameter)))
+                  for touchstone in duts]
+        plot_decimated_collection(ax0, traces, colors=trace_colors(len(duts)), linewidths=2, alpha=0.75)
+    ax0.set_xlim(PLOT_0_X_MIN, PLOT_0_X_MAX)
+    ax0.set_ylim(PLOT_0_Y_MIN, PLOT_0_Y_MAX)
 
-        trace_label = ('Pin = -40 dBm', 'Pin = -30 dBm', 'Pin = -20 dBm', 'Pin = -10 dBm', 'Pin = 0 dBm')
+    plt.savefig('Multiple_DUTs_S_parameters.png', dpi=300)
 
-        if sys.argv[len(sys.argv) - 1] == 'S11':
-            ax0.plot(frequency, s11_db, label=('DUT' + str([i + 1]) + ' ' + str(sys.argv[len(sys.argv) - 1])),
-                     color=trace_color[i], linewidth=2, alpha=0.75)
-        elif sys.argv[len(sys.argv) - 1] == 'S21':
-            ax0.plot(frequency, s21_db, label=('DUT' + str([i + 1]) + ' ' + str(sys.argv[len(sys.argv) - 1])),
-                     color=trace_color[i], linewidth=2, alpha=0.75)
-        elif sys.argv[len(sys.argv) - 1] == 'S12':
-            ax0.plot(frequency, s12_db, label=('DUT' + str([i + 1]) + ' ' + str(sys.argv[len(sys.argv) - 1])),
-                     color=trace_color[i], linewidth=2, alpha=0.75)
-        elif sys.argv[len(sys.argv) - 1] == 'S22':
-            ax0.plot(frequency, s22_db, label=('DUT' + str([i + 1]) + ' ' + str(sys.argv[len(sys.argv) - 1])),
-                     color=trace_color[i], linewidth=2, alpha=0.75)
-        else:
-            print('Specified scattering parameter does not exist')
-            sys.exit(1)
+    plt.show()
 
-        clear_variables()
 
-    ax0.legend(loc='upper right', fontsize=14)
+def stack_duts(duts, parameter):
+
+    # All DUTs on the frequency axis of the widest sweep, one row per DUT. The
+    # sweeps of a lot are normally the same, the others are interpolated and
+    # the points out of their own sweep are NaN, so they don't add made-up
+    # data to the statistics.
+    reference = max(duts, key=lambda touchstone: np.ptp(touchstone.frequency) if len(touchstone.frequency) else -1)
+    frequency = reference.frequency
+    traces = np.empty((len(duts), len(frequency)))
+    for i, touchstone in enumerate(duts):
+        trace = magnitude_db(get_parameter(touchstone, parameter))
+        if len(touchstone.frequency) != len(frequency) or not np.array_equal(touchstone.frequency, frequency):
+            trace = np.interp(frequency, touchstone.frequency, trace, left=np.nan, right=np.nan)
+        traces[i] = trace
+    return frequency, traces
+
+
+def lot_statistics(traces, percentiles=LOT_PERCENTILES):
+
+    # per frequency statistics over the DUTs (axis 0), each is one NumPy
+    # reduction skipping the points out of the sweep of a DUT (NaN)
+    mean = np.nanmean(traces, axis=0)
+    sigma = np.nanstd(traces, axis=0)
+    return {'mean': mean, 'sigma': sigma,
+            'min': np.nanmin(traces, axis=0), 'max': np.nanmax(traces, axis=0),
+            'percentiles': np.nanpercentile(traces, percentiles, axis=0)}
+
+
+def find_outliers(traces, statistics, num_sigmas=OUTLIER_SIGMAS, fraction=OUTLIER_FRACTION):
+
+    # DUT indexes, the most deviating first, the share is taken of the points in the sweep of the DUT
+    deviation = np.abs(traces - statistics['mean']) > num_sigmas * statistics['sigma']
+    out_fraction = deviation.sum(axis=1) / np.maximum(np.count_nonzero(~np.isnan(traces), axis=1), 1)
+    outliers = np.flatnonzero(out_fraction > fraction)
+    return outliers[np.argsort(-out_fraction[outliers], kind='stable')]
+
+
+def plot_lot(file_names, frequency, traces, parameter, percentiles=LOT_PERCENTILES):
+
+    # a few polygons and lines whatever the number of DUTs
+    statistics = lot_statistics(traces, percentiles)
+    outliers = find_outliers(traces, statistics)
+    x = frequency / 10 ** 6
+    mean = statistics['mean']
+    sigma = statistics['sigma']
+
+    ax0 = make_axes()
+    ax0.fill_between(x, statistics['min'], statistics['max'], color='#0000CC', alpha=0.15, linewidth=0,
+                     label='min/max')
+    ax0.fill_between(x, mean - OUTLIER_SIGMAS * sigma, mean + OUTLIER_SIGMAS * sigma, color='#0000CC', alpha=0.2,
+                     linewidth=0, label='mean +/- ' + str(OUTLIER_SIGMAS) + ' sigma')
+    ax0.fill_between(x, statistics['percentiles'][0], statistics['percentiles'][-1], color='#0000CC', alpha=0.3,
+                     linewidth=0, label=str(percentiles[0]) + '...' + str(percentiles[-1]) + ' %')
+    plot_decimated(ax0, x, mean, label='mean ' + parameter + ' (' + str(len(traces)) + ' DUTs)',
+                   color='#00008B', linewidth=2, alpha=0.75)
+    for i in outliers[:OUTLIER_MAX_PLOT]:
+        inside = ~np.isnan(traces[i])
+        plot_decimated(ax0, x[inside], traces[i][inside], label=trace_label(file_names[i], parameter),
+                       color='#C00000', linewidth=1, alpha=0.75)
+
+    ax0.legend(loc='upper right', fontsize=10)
     ax0.set_xlim(PLOT_0_X_MIN, PLOT_0_X_MAX)
     ax0.set_ylim(PLOT_0_Y_MIN, PLOT_0_Y_MAX)
 
-    # For output png-file naming we delete extension from INPUT_FILE_NAME.sXp
-    plt.savefig(fname='Multiple_DUTs_S_parameters', fmt='png', dpi=300)
+    if len(outliers):
+        print(str(len(outliers)) + ' outlier(s): ' + ', '.join(os.path.basename(file_names[i]) for i in outliers))
+
+    plt.savefig('Lot_S_parameters.png', dpi=300)
 
     plt.show()
 
 
 if __name__ == '__main__':
 
-    # relate number of DUT's to the number of command line arguments
-    num_duts = len(sys.argv) - 2
+    # --lot may go anywhere in the command line
+    lot_mode = '--lot' in sys.argv
+    args = [arg for arg in sys.argv[1:] if arg != '--lot']
+
+    if len(args) < 2:
+        print("Usage: ", os.path.basename(sys.argv[0]), "<DUT1.s2p> <DUT2.s2p> ... <DUTn.s2p> Sxx [--lot]")
+        sys.exit(1)
+
+    # the last command line argument is the parameter, the others are DUT's files
+    file_names = args[:-1]
+    parameter = args[-1].upper()
+
+    duts = load_duts(file_names)
+
+    for touchstone in duts:
+        try:
+            get_parameter(touchstone, parameter)
+        except KeyError:
+            print('Specified scattering parameter does not exist')
+            sys.exit(1)
 
-    plot_data(num_duts)
+    if lot_mode:
+        frequency, traces = stack_duts(duts, parameter)
+        plot_lot(file_names, frequency, traces, parameter)
+    else:
+        plot_data(file_names, duts, parameter)
@@ -0,0 +1,296 @@
+# coding: utf-8
+# Touchstone (.s1p ... .s4p) reader shared by the S-parameter tools.
+# The option line "# <unit> <parameter> <format> R <impedance>" is decoded, the comments
+# ("!" up to the end of line) are skipped, the numeric block is converted by NumPy in one
+# call and decoded into complex matrices:
+# data[k, i, j] is the parameter (i + 1)(j + 1) at frequency[k], e.g. data[:, 1, 0] is S21.
+# The noise parameters block of the two-port files is skipped.
+# load_touchstone() keeps the decoded arrays in a binary sidecar next to the file, so the
+# next runs memory-map them instead of parsing the text again.
+
+from collections import namedtuple
+import hashlib
+import json
+import os
+import re
+import warnings
+
+import numpy as np
+
+Touchstone = namedtuple('Touchstone', 'frequency data num_ports parameter impedance')
+
+FREQUENCY_UNITS = {'HZ': 1.0, 'KHZ': 1e3, 'MHZ': 1e6, 'GHZ': 1e9}
+PARAMETERS = ('S', 'Y', 'Z', 'H', 'G')
+FORMATS = ('DB', 'MA', 'RI')
+
+# option line defaults of the Touchstone specification
+DEFAULT_OPTIONS = ('GHZ', 'S', 'MA', 50.0)
+
+comment = re.compile(r'!.*')
+option_line = re.compile(r'^[ \t]*#(.*)$', re.M)
+data_line = re.compile(r'^.*\S.*$', re.M)
+ports_extension = re.compile(r'\.s(\d+)p$', re.I)
+
+# Sidecar cache: <file>.npy holds the frequency and the parameters as one complex
+# array of (points, 1 + ports^2) shape, <file>.json holds its key and the options
+CACHE_SUFFIX = '.npy'
+CACHE_INFO_SUFFIX = '.json'
+
+
+def parse_options(line):
+
+    # "# MHz S DB R 50" -> (1e6, 'S', 'DB', 50.0), the fields may go in any order
+    unit, parameter, data_format, impedance = DEFAULT_OPTIONS
+    fields = line.upper().split()
+    i = 0
+    while i < len(fields):
+        field = fields[i]
+        if field in FREQUENCY_UNITS:
+            unit = field
+        elif field in PARAMETERS:
+            parameter = field
+        elif field in FORMATS:
+            data_format = field
+        elif field == 'R' and i + 1 < len(fields):
+            impedance = float(fields[i + 1])
+            i += 1
+        else:
+            raise ValueError('Unknown Touchstone option: ' + field)
+        i += 1
+    return FREQUENCY_UNITS[unit], parameter, data_format, impedance
+
+
+def decode_pairs(first, second, data_format):
+    if data_format == 'RI':
+        return first + 1j * second
+    if data_format == 'DB':
+        first = 10 ** (first / 20)
+    return first * np.exp(1j * np.deg2rad(second))
+
+
+def count_ports(file_name, first_line):
+
+    # The number of ports is taken from the extension if the first data line
+    # agrees with it: 1 + 2 * n^2 values for one and two ports, the first
+    # matrix row (1 + 2 * n values) for more ports. Otherwise it comes from
+    # the first line (a single pair written to an .s2p file by some VNAs).
+    num_values = len(first_line.split())
+    match = ports_extension.search(file_name)
+    if match:
+        num_ports = int(match.group(1))
+        if num_values == 1 + 2 * num_ports ** 2 or (num_ports > 2 and num_values == 1 + 2 * num_ports):
+            return num_ports
+    for num_ports in (1, 2):
+        if num_values == 1 + 2 * num_ports ** 2:
+            return num_ports
+    raise ValueError(file_name + ': cannot find the number of ports from ' + str(num_values) + ' values per line')
+
+
+def strip_noise_block(text):
+
+    # The noise parameters of a two-port file follow the network data: lines
+    # of 5 values starting from a low frequency again. The network data ends
+    # at the first line whose frequency is not above the previous one.
+    previous = None
+    position = 0
+    for line in text.splitlines(keepends=True):
+        fields = line.split()
+        if fields:
+            try:
+                frequency = float(fields[0])
+            except ValueError:
+                frequency = None  # reported by the numeric block conversion
+            if frequency is not None:
+                if previous is not None and frequency <= previous:
+                    return text[:position]
+                previous = frequency
+        position += len(line)
+    return text
+
+
+def read_touchstone(file_name):
+    """ Reads Touchstone file into complex NumPy arrays.
+
+    Args:
+        file_name: Touchstone v1 file (.s1p, .s2p, .s3p, .s4p)
+
+    Returns:
+        Touchstone record: frequency in Hz, data of (points, ports, ports) shape,
+        number of ports, parameter type (S, Y, Z, H, G) and reference impedance
+    """
+    with open(file_name, 'rb') as input_file:
+        return parse_touchstone(input_file.read().decode('latin-1'), file_name)
+
+
+def parse_touchstone(text, file_name):
+
+    # the option line goes before the data, only the comments may go above it
+    match = option_line.search(text)
+    if match:
+        multiplier, parameter, data_format, impedance = parse_options(comment.sub('', match.group(1)))
+        text = text[match.end():]
+    else:
+        multiplier, parameter, data_format, impedance = parse_options('')
+    if '!' in text:
+        text = comment.sub('', text)
+
+    match = data_line.search(text)
+    if match is None:
+        return Touchstone(np.empty(0), np.empty((0, 0, 0), complex), 0, parameter, impedance)
+    num_ports = count_ports(os.path.basename(file_name), match.group(0))
+
+    row_length = 1 + 2 * num_ports ** 2
+    values = parse_values(text, file_name)
+    if num_ports == 2 and (values.size % row_length or not is_increasing(values[::row_length])):
+        # the rows don't line up or the frequency goes back: the noise block
+        values = parse_values(strip_noise_block(text), file_name)
+    if values.size % row_length:
+        raise ValueError(file_name + ': ' + str(values.size) + ' values do not make rows of ' + str(row_length))
+    values = values.reshape(-1, row_length)
+
+    frequency = values[:, 0] * multiplier
+    data = decode_pairs(values[:, 1::2], values[:, 2::2], data_format).reshape(-1, num_ports, num_ports)
+    if num_ports == 2:
+        # two-port files go in column order: 11 21 12 22
+        data = data.transpose(0, 2, 1)
+    return Touchstone(frequency, data, num_ports, parameter, impedance)
+
+
+def parse_values(text, file_name):
+
+    # the whole numeric block at once, the lines wrapped by the 3- and 4-port
+    # files don't matter since the values are counted, not the lines
+    # (older NumPy only warns about a bad value and stops there)
+    with warnings.catch_warnings():
+        warnings.simplefilter('error', DeprecationWarning)
+        try:
+            return np.fromstring(text, sep=' ')
+        except (DeprecationWarning, ValueError):
+            raise ValueError(file_name + ': not a number in the data block') from None
+
+
+def is_increasing(frequency):
+    return bool(np.all(frequency[1:] > frequency[:-1]))
+
+
+def get_parameter(touchstone, name):
+
+    # "S21" -> data[:, 1, 0]
+    match = re.fullmatch(r'([A-Z])(\d)(\d)', name.upper())
+    if match is None or match.group(1) != touchstone.parameter:
+        raise KeyError(name)
+    i = int(match.group(2)) - 1
+    j = int(match.group(3)) - 1
+    if not (0 <= i < touchstone.num_ports and 0 <= j < touchstone.num_ports):
+        raise KeyError(name)
+    return touchstone.data[:, i, j]
+
+
+def magnitude_db(values):
+    return 20 * np.log10(np.abs(values))
+
+
+def phase_deg(values):
+    return np.angle(values, deg=True)
+
+
+def cache_read(file_name, stat):
+
+    # The cache is valid if the size and mtime of the file match. A file with
+    # the same size but another mtime (copied, touched) is hashed and still
+    # served from the cache if its content is the same.
+    try:
+        with open(file_name + CACHE_INFO_SUFFIX, 'r') as info_file:
+            info = json.load(info_file)
+        if info['size'] != stat.st_size:
+            return None
+        if info['mtime'] != stat.st_mtime_ns:
+            with open(file_name, 'rb') as input_file:
+                if hashlib.sha1(input_file.read()).hexdigest() != info['sha1']:
+                    return None
+            info['mtime'] = stat.st_mtime_ns
+            write_cache_info(file_name, info)
+        # memory-mapped, the arrays below are views of the file
+        block = np.load(file_name + CACHE_SUFFIX, mmap_mode='r')
+    except (OSError, ValueError, KeyError):
+        return None
+    num_ports = info['num_ports']
+    if block.shape != (info['points'], 1 + num_ports ** 2):
+        return None
+    return Touchstone(block[:, 0].real, block[:, 1:].reshape(-1, num_ports, num_ports),
+                      num_ports, info['parameter'], info['impedance'])
+
+
+def write_cache_info(file_name, info):
+    with open(file_name + CACHE_INFO_SUFFIX + '.part', 'w') as info_file:
+        json.dump(info, info_file)
+    os.replace(file_name + CACHE_INFO_SUFFIX + '.part', file_name + CACHE_INFO_SUFFIX)
+
+
+def cache_write(file_name, stat, digest, touchstone):
+
+    # the old key goes first, so a reader never pairs it with the new array
+    if os.path.exists(file_name + CACHE_INFO_SUFFIX):
+        os.remove(file_name + CACHE_INFO_SUFFIX)
+    points = len(touchstone.frequency)
+    block = np.empty((points, 1 + touchstone.num_ports ** 2), complex)
+    block[:, 0] = touchstone.frequency
+    block[:, 1:] = touchstone.data.reshape(points, -1)
+    with open(file_name + CACHE_SUFFIX + '.part', 'wb') as cache_file:
+        np.save(cache_file, block)
+    os.replace(file_name + CACHE_SUFFIX + '.part', file_name + CACHE_SUFFIX)
+    write_cache_info(file_name, {'size': stat.st_size, 'mtime': stat.st_mtime_ns, 'sha1': digest,
+                                 'points': points, 'num_ports': touchstone.num_ports,
+                                 'parameter': touchstone.parameter, 'impedance': touchstone.impedance})
+
+
+def load_touchstone(file_name, cache=True):
+    """ Reads Touchstone file through the sidecar cache.
+
+    The first read parses the file and writes the cache next to it, the next
+    reads memory-map the cached arrays. A read-only directory just disables
+    the cache.
+
+    Args:
+        file_name: Touchstone v1 file (.s1p, .s2p, .s3p, .s4p)
+        cache: use and update the sidecar cache
+
+    Returns:
+        Touchstone record like read_touchstone(), the arrays served from
+        the cache are read-only
+    """
+    if cache:
+        touchstone = cache_read(file_name, os.stat(file_name))
+        if touchstone is not None:
+            return touchstone
+
+    touchstone, cached = parse_and_cache(file_name, cache)
+    return touchstone
+
+
+def parse_and_cache(file_name, cache=True):
+
+    # parses the file and writes its cache, tells if the cache has been written
+    with open(file_name, 'rb') as input_file:
+        raw = input_file.read()
+        stat = os.fstat(input_file.fileno())
+    touchstone = parse_touchstone(raw.decode('latin-1'), file_name)
+
+    if cache and touchstone.num_ports:
+        try:
+            cache_write(file_name, stat, hashlib.sha1(raw).hexdigest(), touchstone)
+            return touchstone, True
+        except OSError:
+            pass
+    return touchstone, False
+
+
+def cache_touchstone(file_name):
+
+    # Worker of a process pool: brings the cache of the file up to date.
+    # Returns None if the cache is valid, so the caller memory-maps it instead
+    # of receiving the arrays, or the parsed record if it can't be written.
+    if cache_read(file_name, os.stat(file_name)) is not None:
+        return None
+    touchstone, cached = parse_and_cache(file_name)
+    return None if cached else touchstone
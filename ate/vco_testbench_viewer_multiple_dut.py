@@ -8,6 +8,8 @@ import matplotlib.pyplot as plt
 from matplotlib.ticker import (MultipleLocator)
 import sys
 
+from decimated_plot import plot_decimated
+
 # TODO:
 # 1. Add autoscale function if "auto" key is entered in command line.
 
@@ -88,7 +90,7 @@ def plot_data(data, x_axis_name, x_axis_set, y0_axis_name, y0_axis_set, y1_axis_
     for i in range(len(data)):
 
         vctl_v, freq, pwr = data[i]
-        ax0.plot(vctl_v, freq, label=trace_label[i], color=trace_color[i], linewidth=2, alpha=0.75)
+        plot_decimated(ax0, vctl_v, freq, label=trace_label[i], color=trace_color[i], linewidth=2, alpha=0.75)
 
     ax0.legend(loc='lower right', fontsize=12)
     ax0.set_xlim(x_axis_set[0], x_axis_set[1])
@@ -108,13 +110,13 @@ def plot_data(data, x_axis_name, x_axis_set, y0_axis_name, y0_axis_set, y1_axis_
     for i in range(len(data)):
 
         vctl_v, freq, pwr = data[i]
-        ax1.plot(vctl_v, pwr, label=trace_label[i], color=trace_color[i], linewidth=2, alpha=0.75)
+        plot_decimated(ax1, vctl_v, pwr, label=trace_label[i], color=trace_color[i], linewidth=2, alpha=0.75)
 
     ax1.legend(loc='lower right', fontsize=12)
     ax1.set_xlim(x_axis_set[0], x_axis_set[1])
     ax1.set_ylim(y1_axis_set[0], y1_axis_set[1])
 
-    plt.savefig(fname='Multiple_DUTs_VCO_parameters', fmt='png', dpi=300)
+    plt.savefig('Multiple_DUTs_VCO_parameters.png', dpi=300)
 
     plt.show()
 
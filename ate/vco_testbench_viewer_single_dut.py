@@ -4,6 +4,8 @@ from matplotlib.ticker import (MultipleLocator)
 import os.path
 import sys
 
+from decimated_plot import plot_decimated
+
 # To-Do list
 # 1. read and decode Touchstone preamble
 # for frequency units, and number of model ports
@@ -87,7 +89,7 @@ def plot_data(x, y1, y2, file_name):
     ax0.tick_params(which='minor', length=5, width=1)
 
     # Trace "y1" has Deep Blue-Violet color
-    ax0.plot(x, y1, label="DUT Frequency", color='#00805C', linewidth=2, alpha=0.75)
+    plot_decimated(ax0, x, y1, label="DUT Frequency", color='#00805C', linewidth=2, alpha=0.75)
     # Trace "y2" has Deep Coral Red color
 #    ax0.plot(x, y2, label="S21", color='#99004C', linewidth=2, alpha=0.75)
     # Trace "y3" has Deep Blue color
@@ -113,7 +115,7 @@ def plot_data(x, y1, y2, file_name):
     ax1.tick_params(which='minor', length=5, width=1)
 
     # Trace "y1" has Deep Blue-Violet color
-    ax1.plot(x, y2, label="DUT Power", color='#00805C', linewidth=2, alpha=0.75)
+    plot_decimated(ax1, x, y2, label="DUT Power", color='#00805C', linewidth=2, alpha=0.75)
     # Trace "y2" has Deep Coral Red color
     #    ax0.plot(x, y2, label="S21", color='#99004C', linewidth=2, alpha=0.75)
     # Trace "y3" has Deep Blue color
@@ -126,7 +128,7 @@ def plot_data(x, y1, y2, file_name):
     ax1.set_ylim(PLOT_1_Y_MIN, PLOT_1_Y_MAX)
 
     # For output png-file naming we delete extension from INPUT_FILE_NAME.sXp
-    plt.savefig(fname=file_name[:-3], fmt='png', dpi=300)
+    plt.savefig(os.path.splitext(file_name)[0] + '.png', dpi=300)
 
     plt.show()
 